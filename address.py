@@ -1,6 +1,6 @@
 # Address generation
 
-from dumb25519 import Point, Scalar, random_scalar, hash_to_scalar
+from dumb25519 import Point, Scalar, fixed_base, random_scalar, hash_bytes_to_scalar
 
 class AddressParameters:
 	def __init__(self,F,G,lookahead=0):
@@ -11,8 +11,8 @@ class AddressParameters:
 		if not isinstance(lookahead,int) or not lookahead >= 0:
 			raise ValueError('Bad type or value for diversifier lookahead!')
 		
-		self.F = F
-		self.G = G
+		self.F = fixed_base(F)
+		self.G = fixed_base(G)
 		self.lookahead = lookahead
 
 class SpendKey:
@@ -47,9 +47,9 @@ class SpendKey:
 		if not isinstance(i,int) or not i >= 0 or not i <= self.params.lookahead:
 			raise TypeError('Bad type or value for diversifier!')
 		
-		Q0 = hash_to_scalar('Q0',self.s1,i)*self.params.F
+		Q0 = hash_bytes_to_scalar('Q0',self.s1,i)*self.params.F
 		Q1 = self.s1*Q0
-		Q2 = (hash_to_scalar('Q2',self.s1,i) + self.s2)*self.params.F + self.r*self.params.G
+		Q2 = (hash_bytes_to_scalar('Q2',self.s1,i) + self.s2)*self.params.F + self.r*self.params.G
 
 		return PublicAddress(Q0,Q1,Q2)
 
@@ -89,7 +89,7 @@ class IncomingViewKey:
 		self.table = {}
 	
 		for i in range(self.params.lookahead+1):
-			entry = hash_to_scalar('Q2',self.s1,i)*self.params.F + base.Q2
+			entry = hash_bytes_to_scalar('Q2',self.s1,i)*self.params.F + base.Q2
 			self.table[repr(entry)] = i
 
 	def get_diversifier(self,Q2):
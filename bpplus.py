@@ -3,21 +3,156 @@
 # {(H,G,n),C ; (v,r) | 0 <= v < 2^n, C = vH + rG}
 
 import dumb25519
-from dumb25519 import Point, Scalar, ScalarVector, PointVector, hash_to_scalar, random_scalar, hash_to_point, multiexp
+import mmap
+from hashlib import blake2b
+from dumb25519 import Point, Scalar, ScalarVector, PointVector, fixed_base, scalar_vector, hash_bytes_to_scalar, random_scalar, hash_bytes_to_point, multiexp, subset_sum
 import transcript
 
+# Default number of Gi (and Hi) generators in a saved table
+max_generators = 1024
+
+# BLAKE2b digests of saved tables of the default derivation, by size
+pinned_digests = {
+	1024: bytes.fromhex('e1818b4a9529ed37daa46ef904097e7c87879fd37ef426b6edb279a3d4c38dbbe0150cad5b07dcf27ec772a9666e9977a0cc6eeeb25c906a68ffec6d0b8bd50d')
+}
+
+# Table of Gi and Hi generators
+#
+# Generators are derived (or read from a file) once, in order, and statements receive copies of a prefix
+# A saved table stores the affine coordinates of (Gi[i],Hi[i]) for each index, so a prefix is a contiguous region of the file
+# The file header binds all entries with a digest, which must match a pinned or caller-supplied value
+class GeneratorTable:
+	magic = b'Spark generators'
+	record_bytes = 128
+	header_bytes = 16 + 4 + 64
+
+	def __init__(self,size=max_generators,path=None,digest=None):
+		if not isinstance(size,int) or size < 1:
+			raise ValueError('Bad type or value for generator table size!')
+
+		self.size = size
+		self.Gi = PointVector()
+		self.Hi = PointVector()
+		self.data = None
+
+		if path is not None:
+			self.load(path,digest)
+
+	# Memory-map a saved table; generators are decoded only as they are requested
+	#
+	# The digest of all entries is checked against the expected one before any entry is used
+	def load(self,path,digest=None):
+		with open(path,'rb') as f:
+			data = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+		try:
+			if len(data) < self.header_bytes or data[:len(self.magic)] != self.magic:
+				raise ValueError('Bad generator table file!')
+			size = int.from_bytes(data[len(self.magic):len(self.magic)+4],'little')
+			if size < 1 or len(data) != self.header_bytes + size*self.record_bytes:
+				raise ValueError('Bad generator table file!')
+
+			expected = digest if digest is not None else pinned_digests.get(size)
+			if expected is None:
+				raise ValueError('No trusted digest for generator table size!')
+			stored = data[len(self.magic)+4:self.header_bytes]
+			if stored != expected or blake2b(data[self.header_bytes:]).digest() != expected:
+				raise ValueError('Generator table does not match generator derivation!')
+		except ValueError:
+			data.close()
+			raise
+
+		self.size = size
+		self.Gi = PointVector()
+		self.Hi = PointVector()
+		self.data = data
+
+	# Affine coordinates of all entries, as stored in a file
+	def records(self):
+		self.extend(self.size)
+		self.Gi.normalize()
+		self.Hi.normalize()
+		records = bytearray()
+		for i in range(self.size):
+			for value in (self.Gi.X[i],self.Gi.Y[i],self.Hi.X[i],self.Hi.Y[i]):
+				records += value.to_bytes(32,'little')
+		return bytes(records)
+
+	# Digest binding all entries
+	def digest(self):
+		return blake2b(self.records()).digest()
+
+	# Derive the full table and write it to a file
+	def save(self,path):
+		records = self.records()
+		with open(path,'wb') as f:
+			f.write(self.magic)
+			f.write(self.size.to_bytes(4,'little'))
+			f.write(blake2b(records).digest())
+			f.write(records)
+
+	# Make the first n generators available
+	#
+	# Tables that are not backed by a file derive entries on demand beyond their size
+	def extend(self,n):
+		if self.data is not None and n > self.size:
+			raise ValueError('Generator table is too small!')
+		for i in range(len(self.Gi),n):
+			if self.data is not None and i < self.size:
+				offset = self.header_bytes + i*self.record_bytes
+				values = [int.from_bytes(self.data[offset+32*k:offset+32*(k+1)],'little') for k in range(4)]
+				if max(values) >= dumb25519.q:
+					raise ValueError('Bad generator table file!')
+
+				# The digest binds entries to the derivation, so only the cheap curve check is repeated here
+				try:
+					Gi = Point(values[0],values[1])
+					Hi = Point(values[2],values[3])
+				except ValueError:
+					raise ValueError('Bad generator table file!')
+				self.Gi.append(Gi)
+				self.Hi.append(Hi)
+			else:
+				self.Gi.append(hash_bytes_to_point('Gi',i))
+				self.Hi.append(hash_bytes_to_point('Hi',i))
+
+	# Get the first n generators as (Gi,Hi)
+	def prefix(self,n):
+		self.extend(n)
+		return self.Gi[:n],self.Hi[:n]
+
+# Generator table shared by parameters that do not supply their own
+generators = GeneratorTable()
+
 class RangeParameters:
-	def __init__(self,H,G,N):
+	def __init__(self,H,G,N,table=None):
 		if not isinstance(H,Point):
 			raise TypeError('Bad type for parameter H!')
 		if not isinstance(G,Point):
 			raise TypeError('Bad type for parameter G!')
 		if not isinstance(N,int) or N < 1:
 			raise ValueError('Bad type or value for parameter N!')
+		if table is not None and not isinstance(table,GeneratorTable):
+			raise TypeError('Bad type for generator table!')
 		
-		self.H = H
-		self.G = G
+		self.H = fixed_base(H)
+		self.G = fixed_base(G)
 		self.N = N
+		self.table = table
+
+# Number of commitments proved after padding with identity commitments, so the total number of bits is a power of two
+#
+# INPUTS
+#   M: number of commitments (int)
+#   N: number of bits per commitment (int)
+# OUTPUTS
+#   int
+def padded_size(M,N):
+	if N & (N-1) != 0:
+		raise ValueError('Range proof bit length must be a power of two!')
+	padded = 1
+	while padded < M:
+		padded *= 2
+	return padded
 
 class RangeStatement:
 	def __init__(self,params,C):
@@ -25,13 +160,24 @@ class RangeStatement:
 			raise TypeError('Bad type for parameters!')
 		if not isinstance(C,PointVector):
 			raise TypeError('Bad type for range statement input C!')
+		if len(C) == 0:
+			raise IndexError('Range statement requires at least one commitment!')
 		
 		self.G = params.G
 		self.H = params.H
 		self.N = params.N
 		self.C = C
-		self.Gi = PointVector([hash_to_point('Gi ' + str(i)) for i in range(len(C)*self.N)])
-		self.Hi = PointVector([hash_to_point('Hi ' + str(i)) for i in range(len(C)*self.N)])
+		self.M = padded_size(len(C),self.N)
+		self.table = params.table if params.table is not None else generators
+		self.Gi,self.Hi = self.table.prefix(self.M*self.N)
+
+	# Commitments padded with identity commitments
+	def padded(self):
+		C = PointVector()
+		C.extend(self.C)
+		for _ in range(self.M - len(self.C)):
+			C.append(dumb25519.Z)
+		return C
 
 class RangeWitness:
 	def __init__(self,v,r):
@@ -47,7 +193,7 @@ class RangeWitness:
 
 class RangeProof:
 	def __repr__(self):
-		return repr(hash_to_scalar(
+		return repr(hash_bytes_to_scalar(
 			self.A,
 			self.A1,
 			self.B,
@@ -88,19 +234,30 @@ class RangeProof:
 		self.R = R
 
 # Data for a round of the inner product argument
+#
+# The prover does not fold the generators; instead, it tracks the coefficient of each original generator in the folded ones
+# After folding to size n, generator k is the combination of the original generators with index congruent to k modulo n
 class InnerProductRound:
 	def __init__(self,Gi,Hi,G,H,a,b,alpha,y,tr):
 		# Common data
-		self.Gi = Gi
-		self.Hi = Hi
 		self.G = G
 		self.H = H
 		self.y = y
 		self.done = False
 
-		# Prover data
-		self.a = a
-		self.b = b
+		# Original generators and the coefficients of their folds
+		self.points = PointVector()
+		self.points.extend(Gi)
+		self.points.extend(Hi)
+		self.points.append(H)
+		self.points.append(G)
+		self.g = [1]*len(Gi)
+		self.h = [1]*len(Hi)
+		self.n = len(Gi)
+
+		# Prover data, as reduced integers folded in place
+		self.a = list(a.values)
+		self.b = list(b.values)
 		self.alpha = alpha
 
 		# Verifier data
@@ -130,10 +287,13 @@ def wip(a,b,y):
 	if not isinstance(y,Scalar):
 		raise TypeError('Weighted inner product requires Scalar weight!')
 
-	r = Scalar(0)
-	for i in range(len(a)):
-		r += a[i]*y**(i+1)*b[i]
-	return r
+	r = 0
+	y_ = y.x
+	power = y_
+	for a_,b_ in zip(a.values,b.values):
+		r += a_*b_ % dumb25519.l * power
+		power = power*y_ % dumb25519.l
+	return Scalar(r)
 
 # Turn a scalar into a vector of bit scalars
 #
@@ -143,14 +303,7 @@ def wip(a,b,y):
 # OUTPUTS
 #   ScalarVector
 def scalar_to_bits(s,N):
-	result = []
-	for i in range(N-1,-1,-1):
-		if s/Scalar(2**i) == Scalar(0):
-			result.append(Scalar(0))
-		else:
-			result.append(Scalar(1))
-			s -= Scalar(2**i)
-	return ScalarVector(list(reversed(result)))
+	return scalar_vector([(s.x >> i) & 1 for i in range(N)])
 
 # Generate a vector of powers of a scalar, in either direction, indexed at 1
 #
@@ -161,17 +314,41 @@ def scalar_to_bits(s,N):
 # OUTPUTS
 #   ScalarVector
 def exp_scalar(s,l,desc=False):
+	powers = [s.x]
+	for _ in range(1,l):
+		powers.append(powers[-1]*s.x % dumb25519.l)
 	if desc:
-		return ScalarVector([s**(l-i) for i in range(l)])
-	else:
-		return ScalarVector([s**(i+1) for i in range(l)])
+		powers.reverse()
+	return scalar_vector(powers)
+
+# Compute the products of inner-product challenges that scale each final generator
+#
+# Entry i uses the challenge for each round where bit i of the matching halving is set, and its inverse otherwise
+# The first challenge corresponds to the most significant bit, so the vector is built by doubling from the last round
+#
+# INPUTS
+#   challenges: round challenges (list of int)
+#   challenges_inv: inverse round challenges (list of int)
+# OUTPUTS
+#   list of int
+def challenge_products(challenges,challenges_inv):
+	product = 1
+	for x in challenges_inv:
+		product = product*x % dumb25519.l
+	products = [product]
+	for x in reversed(challenges):
+		x2 = x*x % dumb25519.l
+		products.extend([p*x2 % dumb25519.l for p in products])
+	return products
 
 # Perform an inner-product proof round
 #
 # INPUTS
 #   data: round data (InnerProductRound)
 def inner_product(data):
-	n = len(data.Gi)
+	order = dumb25519.l
+	n = data.n
+	MN = len(data.g)
 
 	if n == 1:
 		data.done = True
@@ -182,47 +359,78 @@ def inner_product(data):
 		d = random_scalar()
 		eta = random_scalar()
 
-		data.A = data.Gi[0]*r + data.Hi[0]*s + data.H*(r*data.y*data.b[0] + s*data.y*data.a[0]) + data.G*d
+		a = Scalar(data.a[0])
+		b = Scalar(data.b[0])
+		scalars = [g*r.x % order for g in data.g] + [h*s.x % order for h in data.h]
+		scalars.append((r*data.y*b + s*data.y*a).x)
+		scalars.append(d.x)
+		data.A = multiexp(scalar_vector(scalars),data.points)
 		data.B = data.H*(r*data.y*s) + data.G*eta
 
 		data.tr.update(data.A)
 		data.tr.update(data.B)
 		e = data.tr.challenge()
 
-		data.r1 = r + data.a[0]*e
-		data.s1 = s + data.b[0]*e
+		data.r1 = r + a*e
+		data.s1 = s + b*e
 		data.d1 = eta + d*e + data.alpha*e**2
 
 		return
 
 	n //= 2
-	a1 = data.a[:n]
-	a2 = data.a[n:]
-	b1 = data.b[:n]
-	b2 = data.b[n:]
-	G1 = data.Gi[:n]
-	G2 = data.Gi[n:]
-	H1 = data.Hi[:n]
-	H2 = data.Hi[n:]
+	a = data.a
+	b = data.b
+	y_n = (data.y**n).x
+	y_n_inv = dumb25519.invert(y_n,order)
 
 	dL = random_scalar()
 	dR = random_scalar()
 
-	cL = wip(a1,b2,data.y)
-	cR = wip(a2*data.y**n,b1,data.y)
-	data.L.append(G2**(a1*data.y.invert()**n) + H1**b2 + data.H*cL + data.G*dL)
-	data.R.append(G1**(a2*data.y**n) + H2**b1 + data.H*cR + data.G*dR)
+	cL = wip(scalar_vector(a[:n]),scalar_vector(b[n:]),data.y)
+	cR = wip(scalar_vector([a_*y_n % order for a_ in a[n:]]),scalar_vector(b[:n]),data.y)
+
+	# Each original generator lies in the first or second half of the current folded vector
+	L_scalars = [0]*(2*MN)
+	R_scalars = [0]*(2*MN)
+	for i in range(MN):
+		k = i % (2*n)
+		if k < n:
+			R_scalars[i] = data.g[i]*a[k+n] % order*y_n % order
+			L_scalars[MN+i] = data.h[i]*b[k+n] % order
+		else:
+			L_scalars[i] = data.g[i]*a[k-n] % order*y_n_inv % order
+			R_scalars[MN+i] = data.h[i]*b[k-n] % order
+	L_scalars.extend([cL.x,dL.x])
+	R_scalars.extend([cR.x,dR.x])
+	data.L.append(multiexp(scalar_vector(L_scalars),data.points))
+	data.R.append(multiexp(scalar_vector(R_scalars),data.points))
 
 	data.tr.update(data.L[-1])
 	data.tr.update(data.R[-1])
 	e = data.tr.challenge()
+	e_inv = e.invert()
+
+	# Fold the generator coefficients
+	g_low = e_inv.x
+	g_high = e.x*y_n_inv % order
+	for i in range(MN):
+		if i % (2*n) < n:
+			data.g[i] = data.g[i]*g_low % order
+			data.h[i] = data.h[i]*e.x % order
+		else:
+			data.g[i] = data.g[i]*g_high % order
+			data.h[i] = data.h[i]*e_inv.x % order
 
-	data.Gi = G1*e.invert() + G2*(e*data.y.invert()**n)
-	data.Hi = H1*e + H2*e.invert()
+	# Fold the prover vectors in place
+	a_high = y_n*e_inv.x % order
+	for k in range(n):
+		a[k] = (a[k]*e.x + a[k+n]*a_high) % order
+		b[k] = (b[k]*e_inv.x + b[k+n]*e.x) % order
+	del a[n:]
+	del b[n:]
 
-	data.a = a1*e + a2*data.y**n*e.invert()
-	data.b = b1*e.invert() + b2*e
-	data.alpha = dL*e**2 + data.alpha + dR*e.invert()**2
+	data.n = n
+	data.alpha = dL*e**2 + data.alpha + dR*e_inv**2
 
 # Generate a multi-output proof
 def prove(statement,witness):
@@ -240,7 +448,17 @@ def prove(statement,witness):
 			raise ArithmeticError('Invalid range statement!')
 
 	N = statement.N
-	M = len(statement.C)
+	M = statement.M
+
+	# Pad with commitments to zero
+	commitments = statement.padded()
+	v = ScalarVector()
+	v.extend(witness.v)
+	r = ScalarVector()
+	r.extend(witness.r)
+	for _ in range(M - m):
+		v.append(Scalar(0))
+		r.append(Scalar(0))
 
 	# Curve points
 	G = statement.G
@@ -252,7 +470,7 @@ def prove(statement,witness):
 	tr.update(G)
 	tr.update(H)
 	tr.update(N)
-	for C in statement.C:
+	for C in commitments:
 		tr.update(C)
 
 	one_MN = ScalarVector([Scalar(1) for _ in range(M*N)])
@@ -260,13 +478,13 @@ def prove(statement,witness):
 	# Set amount commitments
 	aL = ScalarVector([])
 	for j in range(M):
-		aL.extend(scalar_to_bits(witness.v[j],N))
+		aL.extend(scalar_to_bits(v[j],N))
 
 	# Set offset bit array
 	aR = aL - one_MN
 
 	alpha = random_scalar()
-	A = Gi**aL + Hi**aR + G*alpha
+	A = subset_sum(Gi,aL.values) - subset_sum(Hi,aL.values,complement=True) + G*alpha
 
 	# Get challenges
 	tr.update(A)
@@ -283,7 +501,7 @@ def prove(statement,witness):
 	aR1 = aR + d*exp_scalar(y,M*N,desc=True) + one_MN*z
 	alpha1 = alpha
 	for j in range(M):
-		alpha1 += z**(2*(j+1))*witness.r[j]*y**(M*N+1)
+		alpha1 += z**(2*(j+1))*r[j]*y**(M*N+1)
 
 	# Initial inner product inputs
 	ip_data = InnerProductRound(Gi,Hi,G,H,aL1,aR1,alpha1,y,tr)
@@ -294,12 +512,216 @@ def prove(statement,witness):
 		if ip_data.done:
 			return RangeProof(A,ip_data.A,ip_data.B,ip_data.r1,ip_data.s1,ip_data.d1,ip_data.L,ip_data.R)
 
+# Weighted verification terms for a single proof
+#
+# The proof is valid exactly when the multiscalar multiplication of its terms is the identity
+# Scalars are reduced integers; those for the common generators are kept separate so batches can sum them
+class ProofTerms:
+	def __init__(self,G,H,Gi,Hi,scalars,points):
+		self.G = G
+		self.H = H
+		self.Gi = Gi
+		self.Hi = Hi
+		self.scalars = scalars
+		self.points = points
+
+# Compute the weighted verification terms for a proof
+#
+# INPUTS
+#   statement: (RangeStatement)
+#   proof: (RangeProof)
+#   weight: nonzero batch weight (Scalar)
+# OUTPUTS
+#   ProofTerms
+def proof_terms(statement,proof,weight):
+	C = statement.padded()
+	N = statement.N
+	A = proof.A
+	A1 = proof.A1
+	B = proof.B
+	r1 = proof.r1
+	s1 = proof.s1
+	d1 = proof.d1
+	L = proof.L
+	R = proof.R
+
+	if not len(L) == len(R):
+		raise IndexError('Range proof data length mismatch!')
+	if not 2**len(L) == len(C)*N:
+		raise IndexError('Range proof size does not match statement!')
+
+	# Helpful quantities
+	M = len(C)
+	MN = M*N
+	order = dumb25519.l
+
+	# Start transcript
+	tr = transcript.Transcript('Bulletproof+')
+	tr.update(statement.G)
+	tr.update(statement.H)
+	tr.update(statement.N)
+	for C_ in C:
+		tr.update(C_)
+
+	# Reconstruct challenges
+	tr.update(A)
+	y = tr.challenge()
+	if y == Scalar(0):
+		raise ArithmeticError('Bad verifier challenge!')
+	z = tr.challenge()
+	if z == Scalar(0):
+		raise ArithmeticError('Bad verifier challenge!')
+
+	# Reconstruct challenges
+	challenges = ScalarVector([]) # challenges
+	for j in range(len(L)):
+		tr.update(L[j])
+		tr.update(R[j])
+		challenges.append(tr.challenge())
+		if challenges[j] == Scalar(0):
+			raise ArithmeticError('Bad verifier challenge!')
+	challenges_inv = challenges.invert()
+	tr.update(A1)
+	tr.update(B)
+	e = tr.challenge()
+	if e == Scalar(0):
+		raise ArithmeticError('Bad verifier challenge!')
+
+	# Powers of y and y^(-1)
+	y_powers = [1]
+	for _ in range(MN+1):
+		y_powers.append(y_powers[-1]*y.x % order)
+	y_inv = y.invert().x
+
+	# Powers of z^2
+	z_powers = [z.x*z.x % order]
+	for _ in range(1,M):
+		z_powers.append(z_powers[-1]*z_powers[0] % order)
+
+	# Aggregate the generator scalars
+	Gi_scalars = [0]*MN
+	Hi_scalars = [0]*MN
+	g_products = challenge_products(challenges.values,challenges_inv.values)
+	e2 = e.x*e.x % order
+	g_base = weight.x*r1.x*e.x % order
+	h_base = weight.x*s1.x*e.x % order
+	g_offset = weight.x*e2*z.x % order
+	y_inv_power = 1
+	for j in range(M):
+		d = weight.x*e2*z_powers[j] % order
+		for i in range(N):
+			index = j*N + i
+			Gi_scalars[index] = (g_base*y_inv_power*g_products[index] + g_offset) % order
+			Hi_scalars[index] = (h_base*g_products[MN-1-index] - d*y_powers[MN-index] - g_offset) % order
+			y_inv_power = y_inv_power*y_inv % order
+			d = 2*d % order
+
+	# Remaining terms
+	scalars = []
+	points = PointVector([])
+	for j in range(M):
+		scalars.append(-weight.x*e2*z_powers[j]*y_powers[MN+1] % order)
+		points.append(C[j])
+
+	# Closed forms for the sum of d and the sum of y^i for 1 <= i <= MN
+	d_sum = sum(z_powers)*((1 << N) - 1) % order
+	if y.x == 1:
+		y_sum = MN
+	else:
+		y_sum = (y_powers[MN+1] - y.x)*dumb25519.invert(y.x - 1,order) % order
+	H_scalar = weight*(r1*y*s1 + e**2*Scalar(y_powers[MN+1]*z.x*d_sum + (z.x*z.x - z.x)*y_sum))
+	G_scalar = weight*d1
+
+	scalars.append((weight*-e).x)
+	points.append(A1)
+	scalars.append((-weight).x)
+	points.append(B)
+	scalars.append((weight*-e**2).x)
+	points.append(A)
+
+	for j in range(len(L)):
+		scalars.append((weight*(-e**2*challenges[j]**2)).x)
+		points.append(L[j])
+		scalars.append((weight*(-e**2*challenges_inv[j]**2)).x)
+		points.append(R[j])
+
+	return ProofTerms(G_scalar.x,H_scalar.x,Gi_scalars,Hi_scalars,scalars,points)
+
+# Check that the terms of a set of proofs sum to the identity using a single multiscalar multiplication
+#
+# INPUTS
+#   terms: (list of ProofTerms)
+#   G,H: common generators (Point)
+#   Gi,Hi: common generator vectors long enough for every proof (PointVector)
+# OUTPUTS
+#   bool
+def check_terms(terms,G,H,Gi,Hi):
+	MN = max(len(terms_.Gi) for terms_ in terms)
+
+	# Weighted coefficients for common generators
+	G_scalar = 0
+	H_scalar = 0
+	Gi_scalars = [0]*MN
+	Hi_scalars = [0]*MN
+
+	# Final multiscalar multiplication data
+	scalars = []
+	points = PointVector([])
+
+	for terms_ in terms:
+		G_scalar += terms_.G
+		H_scalar += terms_.H
+		for i in range(len(terms_.Gi)):
+			Gi_scalars[i] += terms_.Gi[i]
+			Hi_scalars[i] += terms_.Hi[i]
+		scalars.extend(terms_.scalars)
+		points.extend(terms_.points)
+
+	# Common generators
+	scalars.append(G_scalar % dumb25519.l)
+	points.append(G)
+	scalars.append(H_scalar % dumb25519.l)
+	points.append(H)
+	scalars.extend([x % dumb25519.l for x in Gi_scalars])
+	points.extend(Gi[:MN])
+	scalars.extend([x % dumb25519.l for x in Hi_scalars])
+	points.extend(Hi[:MN])
+
+	return multiexp(scalar_vector(scalars),points) == dumb25519.Z
+
+# Find the invalid proofs in a set whose combined check is known to fail
+#
+# Each failing half is bisected further; if the first half passes, the second half must fail and is not checked
+#
+# INPUTS
+#   terms: terms for all proofs (list of ProofTerms)
+#   indexes: proofs in the failing set (list of int)
+#   G,H,Gi,Hi: common generators
+# OUTPUTS
+#   indexes of invalid proofs (list of int)
+def bisect(terms,indexes,G,H,Gi,Hi):
+	if len(indexes) == 1:
+		return indexes
+
+	left = indexes[:len(indexes)//2]
+	right = indexes[len(indexes)//2:]
+	if check_terms([terms[i] for i in left],G,H,Gi,Hi):
+		return bisect(terms,right,G,H,Gi,Hi)
+
+	invalid = bisect(terms,left,G,H,Gi,Hi)
+	if not check_terms([terms[i] for i in right],G,H,Gi,Hi):
+		invalid.extend(bisect(terms,right,G,H,Gi,Hi))
+	return invalid
+
 # Verify a batch of multi-output proofs
-def verify(statements,proofs):
-	# Check statement consistency
+#
+# By default, any invalid proof raises an exception
+# With isolate set, a list of per-proof results is returned instead, and a failing batch is bisected to find the invalid proofs
+def verify(statements,proofs,isolate=False):
+	# Check statement consistency; proofs may have different bit lengths and numbers of commitments
 	G = None
 	H = None
-	N = None
+	table = None
 	max_MN = None
 	Gi = None
 	Hi = None
@@ -321,143 +743,46 @@ def verify(statements,proofs):
 		else:
 			H = statement.H
 
-		if N is not None and statement.N != N:
+		# Generator vectors must be prefixes of the same table
+		if table is not None and statement.table is not table:
 			raise ValueError('Inconsistent range batch statements!')
 		else:
-			N = statement.N
+			table = statement.table
 		
-		if max_MN is None or len(statement.C)*statement.N > max_MN:
-			max_MN = len(statement.C)*statement.N
+		if max_MN is None or len(statement.Gi) > max_MN:
+			max_MN = len(statement.Gi)
 			Gi = statement.Gi
 			Hi = statement.Hi
 	
 	for proof in proofs:
 		if not isinstance(proof,RangeProof):
 			raise TypeError('Bad type for range proof!')
-	
-	# Weighted coefficients for common generators
-	G_scalar = Scalar(0)
-	H_scalar = Scalar(0)
-	Gi_scalars = ScalarVector([Scalar(0)]*max_MN)
-	Hi_scalars = ScalarVector([Scalar(0)]*max_MN)
+	if len(proofs) == 0:
+		return [] if isolate else None
 
-	# Final multiscalar multiplication data
-	scalars = ScalarVector([])
-	points = PointVector([])
-
-	# Process each proof and add it to the batch
+	# Process each proof
+	terms = [None]*len(proofs)
 	for index,proof in enumerate(proofs):
-		C = statements[index].C
-		A = proof.A
-		A1 = proof.A1
-		B = proof.B
-		r1 = proof.r1
-		s1 = proof.s1
-		d1 = proof.d1
-		L = proof.L
-		R = proof.R
-
-		if not len(L) == len(R):
-			raise IndexError
-		if not 2**len(L) == len(C)*N:
-			raise IndexError
-
-		# Helpful quantities
-		M = len(C)
-		one_MN = ScalarVector([Scalar(1) for _ in range(M*N)])
-
 		# Batch weight
 		weight = random_scalar()
 		if weight == Scalar(0):
 			raise ArithmeticError
 
-		# Start transcript
-		tr = transcript.Transcript('Bulletproof+')
-		tr.update(statement.G)
-		tr.update(statement.H)
-		tr.update(statement.N)
-		for C_ in C:
-			tr.update(C_)
-
-		# Reconstruct challenges
-		tr.update(proof.A)
-		y = tr.challenge()
-		if y == Scalar(0):
-			raise ArithmeticError('Bad verifier challenge!')
-		z = tr.challenge()
-		if z == Scalar(0):
-			raise ArithmeticError('Bad verifier challenge!')
-
-		# Start preparing data
-		d = ScalarVector([])
-		for j in range(M):
-			for i in range(N):
-				d.append(z**(2*(j+1))*Scalar(2)**i)
-
-		# Reconstruct challenges
-		challenges = ScalarVector([]) # challenges
-		for j in range(len(L)):
-			tr.update(L[j])
-			tr.update(R[j])
-			challenges.append(tr.challenge())
-			if challenges[j] == Scalar(0):
-				raise ArithmeticError('Bad verifier challenge!')
-		challenges_inv = challenges.invert()
-		tr.update(A1)
-		tr.update(B)
-		e = tr.challenge()
-		if e == Scalar(0):
-			raise ArithmeticError('Bad verifier challenge!')
+		try:
+			terms[index] = proof_terms(statements[index],proof,weight)
+		except (IndexError,ArithmeticError):
+			if not isolate:
+				raise
 
-		# Aggregate the generator scalars
-		for i in range(M*N):
-			index = i
-			g = r1*e*y.invert()**i
-			h = s1*e
-			for j in range(len(L)-1,-1,-1):
-				J = len(challenges)-j-1
-				base_power = 2**j
-				if index//base_power == 0: # rounded down
-					g *= challenges_inv[J]
-					h *= challenges[J]
-				else:
-					g *= challenges[J]
-					h *= challenges_inv[J]
-					index -= base_power
-			Gi_scalars[i] += weight*(g + e**2*z)
-			Hi_scalars[i] += weight*(h - e**2*(d[i]*y**(M*N-i)+z))
-
-		# Remaining terms
-		for j in range(M):
-			scalars.append(weight*(-e**2*z**(2*(j+1))*y**(M*N+1)))
-			points.append(C[j])
-
-		H_scalar += weight*(r1*y*s1 + e**2*(y**(M*N+1)*z*one_MN**d + (z**2-z)*one_MN**exp_scalar(y,M*N)))
-		G_scalar += weight*d1
-
-		scalars.append(weight*-e)
-		points.append(A1)
-		scalars.append(-weight)
-		points.append(B)
-		scalars.append(weight*-e**2)
-		points.append(A)
-
-		for j in range(len(L)):
-			scalars.append(weight*(-e**2*challenges[j]**2))
-			points.append(L[j])
-			scalars.append(weight*(-e**2*challenges_inv[j]**2))
-			points.append(R[j])
+	if not isolate:
+		if not check_terms(terms,G,H,Gi,Hi):
+			raise ArithmeticError('Failed verification!')
+		return
 
-	# Common generators
-	scalars.append(G_scalar)
-	points.append(G)
-	scalars.append(H_scalar)
-	points.append(H)
-	for i in range(max_MN):
-		scalars.append(Gi_scalars[i])
-		points.append(Gi[i])
-		scalars.append(Hi_scalars[i])
-		points.append(Hi[i])
-
-	if not multiexp(scalars,points) == dumb25519.Z:
-		raise ArithmeticError('Failed verification!')
+	# Isolate any invalid proofs
+	indexes = [index for index in range(len(proofs)) if terms[index] is not None]
+	results = [terms[index] is not None for index in range(len(proofs))]
+	if len(indexes) > 0 and not check_terms([terms[index] for index in indexes],G,H,Gi,Hi):
+		for index in bisect(terms,indexes,G,H,Gi,Hi):
+			results[index] = False
+	return results
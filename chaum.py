@@ -1,6 +1,6 @@
 # Aggregated modified Chaum proving system
 
-from dumb25519 import Z, Point, PointVector, Scalar, ScalarVector, hash_to_scalar, random_scalar
+from dumb25519 import Z, Point, PointVector, Scalar, ScalarVector, fixed_base, hash_bytes_to_scalar, random_scalar
 import transcript
 
 class ChaumParameters:
@@ -14,10 +14,10 @@ class ChaumParameters:
 		if not isinstance(U,Point):
 			raise TypeError('Bad type for parameter U!')
 		
-		self.F = F
-		self.G = G
-		self.H = H
-		self.U = U
+		self.F = fixed_base(F)
+		self.G = fixed_base(G)
+		self.H = fixed_base(H)
+		self.U = fixed_base(U)
 
 class ChaumStatement:
 	def __init__(self,params,context,S,T):
@@ -55,7 +55,7 @@ class ChaumWitness:
 
 class ChaumProof:
 	def __repr__(self):
-		return repr(hash_to_scalar(
+		return repr(hash_bytes_to_scalar(
 			self.A1,
 			self.A2,
 			self.t1,
@@ -151,17 +151,17 @@ def verify(statement,proof):
 	c = challenge(statement,proof.A1,proof.A2)
 
 	L = proof.A1
-	R = proof.t2*statement.G + proof.t3*statement.H
+	R = statement.G.multiply(proof.t2,vartime=True) + statement.H.multiply(proof.t3,vartime=True)
 	for i in range(n):
-		L += c**(i+1)*statement.S[i]
-		R += proof.t1[i]*statement.F
+		L += statement.S[i].multiply(c**(i+1),vartime=True)
+		R += statement.F.multiply(proof.t1[i],vartime=True)
 	if not L == R:
 		raise ArithmeticError('Failed Chaum verification!')
 	
 	L = Z
-	R = proof.t2*statement.G
+	R = statement.G.multiply(proof.t2,vartime=True)
 	for i in range(n):
-		L += proof.A2[i] + c**(i+1)*statement.U
-		R += proof.t1[i]*statement.T[i]
+		L += proof.A2[i] + statement.U.multiply(c**(i+1),vartime=True)
+		R += statement.T[i].multiply(proof.t1[i],vartime=True)
 	if not L == R:
 		raise ArithmeticError('Failed Chaum verification!')
@@ -1,6 +1,6 @@
 # Coin structure
 
-from dumb25519 import Point, Scalar, PointVector, ScalarVector, random_scalar, hash_to_scalar
+from dumb25519 import Point, Scalar, PointVector, ScalarVector, fixed_base, random_scalar, hash_bytes_to_scalar
 import address
 import bpplus
 import schnorr
@@ -21,10 +21,10 @@ class CoinParameters:
 		if not isinstance(memo_bytes,int) or memo_bytes < 1:
 			raise ValueError('Bad type or value for parameter memo_bytes!')
 		
-		self.F = F
-		self.G = G
-		self.H = H
-		self.U = U
+		self.F = fixed_base(F)
+		self.G = fixed_base(G)
+		self.H = fixed_base(H)
+		self.U = fixed_base(U)
 		self.value_bytes = value_bytes
 		self.memo_bytes = memo_bytes
 
@@ -48,7 +48,7 @@ class CoinDelegation:
 class Coin:
 	def __repr__(self):
 		if self.is_mint:
-			return repr(hash_to_scalar(
+			return repr(hash_bytes_to_scalar(
 				self.K,
 				self.S,
 				self.C,
@@ -57,8 +57,18 @@ class Coin:
 				self.janus,
 				self.view_tag
 			))
+		elif self.aggregate:
+			# The shared range proof is bound by the spend transaction instead
+			return repr(hash_bytes_to_scalar(
+				self.K,
+				self.S,
+				self.C,
+				self.enc,
+				self.janus,
+				self.view_tag
+			))
 		else:
-			return repr(hash_to_scalar(
+			return repr(hash_bytes_to_scalar(
 				self.K,
 				self.S,
 				self.C,
@@ -68,7 +78,7 @@ class Coin:
 				self.view_tag
 			))
 
-	def __init__(self,params,public,value,memo,is_mint,is_output):
+	def __init__(self,params,public,value,memo,is_mint,is_output,aggregate=False):
 		if not isinstance(params,CoinParameters):
 			raise TypeError('Bad type for parameters!')
 		if not isinstance(public,address.PublicAddress):
@@ -81,6 +91,10 @@ class Coin:
 			raise TypeError('Bad type for coin mint flag!')
 		if not isinstance(is_output,bool):
 			raise TypeError('Bad type for coin output flag!')
+		if not isinstance(aggregate,bool):
+			raise TypeError('Bad type for coin aggregation flag!')
+		if aggregate and (is_mint or not is_output):
+			raise ValueError('Only spend output coins can use an aggregated range proof!')
 
 		# Recovery key
 		k = random_scalar()
@@ -91,14 +105,20 @@ class Coin:
 		self.view_tag = util.view_tag(K_der)
 
 		# Serial number commitment
-		self.S = hash_to_scalar('ser',K_der)*params.F + public.Q2
+		self.S = hash_bytes_to_scalar('ser',K_der)*params.F + public.Q2
 
 		# Value commitment
-		self.C = Scalar(value)*params.G + hash_to_scalar('val',K_der)*params.H
-		if not is_mint:
+		self.C = Scalar(value)*params.G + hash_bytes_to_scalar('val',K_der)*params.H
+
+		# An aggregated range proof is set by the spend transaction
+		self.aggregate = aggregate
+		self.range = None
+		self.range_C = None
+		self.range_index = None
+		if not is_mint and not aggregate:
 			self.range = bpplus.prove(
 				bpplus.RangeStatement(bpplus.RangeParameters(params.G,params.H,8*params.value_bytes),PointVector([self.C])),
-				bpplus.RangeWitness(ScalarVector([Scalar(value)]),ScalarVector([hash_to_scalar('val',K_der)]))
+				bpplus.RangeWitness(ScalarVector([Scalar(value)]),ScalarVector([hash_bytes_to_scalar('val',K_der)]))
 			)
 		
 		# Diversifier assertion
@@ -110,7 +130,7 @@ class Coin:
 		# Encrypt recipient data
 		padded_memo = memo.encode('utf-8')
 		padded_memo += bytearray(params.memo_bytes - len(padded_memo))
-		aead_key = hash_to_scalar('aead',K_der)
+		aead_key = hash_bytes_to_scalar('aead',K_der)
 		if is_mint:
 			self.value = value
 			self.enc = util.aead_encrypt(aead_key,'Mint recipient data',padded_memo)
@@ -144,18 +164,18 @@ class Coin:
 			raise ArithmeticError('View tag does not match!')
 
 		# Test for diversifier
-		Q2 = self.S - hash_to_scalar('ser',K_der)*params.F
+		Q2 = self.S - hash_bytes_to_scalar('ser',K_der)*params.F
 		try:
 			self.diversifier = incoming.get_diversifier(Q2)
 			schnorr.verify(
-				schnorr.SchnorrStatement(schnorr.SchnorrParameters(params.F),hash_to_scalar('Q0',incoming.s1,self.diversifier).invert()*self.K),
+				schnorr.SchnorrStatement(schnorr.SchnorrParameters(params.F),hash_bytes_to_scalar('Q0',incoming.s1,self.diversifier).invert()*self.K),
 				self.janus
 			)
 		except:
 			raise ArithmeticError('Coin does not belong to this public address!')
 		
 		# Decrypt recipient data; check for diversified address consistency
-		aead_key = hash_to_scalar('aead',K_der)
+		aead_key = hash_bytes_to_scalar('aead',K_der)
 		if self.is_mint:
 			memo_bytes = util.aead_decrypt(aead_key,'Mint recipient data',self.enc)
 			if memo_bytes is not None:
@@ -171,11 +191,20 @@ class Coin:
 				raise ArithmeticError('Bad recipient data!')
 
 		# Test for value commitment
-		if not self.C == Scalar(self.value)*params.G + hash_to_scalar('val',K_der)*params.H:
+		if not self.C == Scalar(self.value)*params.G + hash_bytes_to_scalar('val',K_der)*params.H:
 			raise ArithmeticError('Bad coin value commitment!')
 		
 		# Test range proof
-		if not self.is_mint:
+		if not self.is_mint and self.aggregate:
+			if self.range is None:
+				raise ArithmeticError('Coin has no range proof!')
+			if not self.range_C[self.range_index] == self.C:
+				raise ArithmeticError('Coin is not in its aggregated range proof!')
+			bpplus.verify(
+				[bpplus.RangeStatement(bpplus.RangeParameters(params.G,params.H,8*params.value_bytes),self.range_C)],
+				[self.range]
+			)
+		elif not self.is_mint:
 			bpplus.verify(
 				[bpplus.RangeStatement(bpplus.RangeParameters(params.G,params.H,8*params.value_bytes),PointVector([self.C]))],
 				[self.range]
@@ -195,7 +224,7 @@ class Coin:
 		
 		# Recover serial number and generate tag
 		K_der = full.s1*self.K
-		self.s = hash_to_scalar('ser',K_der) + hash_to_scalar('Q2',full.s1,self.diversifier) + full.s2
+		self.s = hash_bytes_to_scalar('ser',K_der) + hash_bytes_to_scalar('Q2',full.s1,self.diversifier) + full.s2
 		self.T = self.s.invert()*(params.U - full.D)
 
 		self.recovered = True
@@ -208,9 +237,9 @@ class Coin:
 		if not self.recovered:
 			raise ValueError('Delegation requires coin recovery!')
 		
-		s1 = hash_to_scalar('ser1',id,self.s,full.s1,full.s2)
-		S1 = self.s*params.F - hash_to_scalar('ser1',id,self.s,full.s1,full.s2)*params.H + full.D
-		c1 = hash_to_scalar('val',full.s1*self.K) - hash_to_scalar('val1',id,self.s,full.s1,full.s2)
-		C1 = Scalar(self.value)*params.G + hash_to_scalar('val1',id,self.s,full.s1,full.s2)*params.H
+		s1 = hash_bytes_to_scalar('ser1',id,self.s,full.s1,full.s2)
+		S1 = self.s*params.F - hash_bytes_to_scalar('ser1',id,self.s,full.s1,full.s2)*params.H + full.D
+		c1 = hash_bytes_to_scalar('val',full.s1*self.K) - hash_bytes_to_scalar('val1',id,self.s,full.s1,full.s2)
+		C1 = Scalar(self.value)*params.G + hash_bytes_to_scalar('val1',id,self.s,full.s1,full.s2)*params.H
 
 		self.delegation = CoinDelegation(id,s1,S1,c1,C1)
@@ -5,7 +5,7 @@ import bpplus
 import chaum
 import coin
 import dumb25519
-from dumb25519 import Point, Scalar, PointVector, hash_to_scalar
+from dumb25519 import Point, Scalar, PointVector, fixed_base, hash_bytes_to_scalar
 import parallel
 import schnorr
 
@@ -24,10 +24,10 @@ class ProtocolParameters:
 		if not isinstance(memo_bytes,int) or memo_bytes < 1:
 			raise ValueError('Bad type or value for parameter value_bytes!')
 		
-		self.F = F
-		self.G = G
-		self.H = H
-		self.U = U
+		self.F = fixed_base(F)
+		self.G = fixed_base(G)
+		self.H = fixed_base(H)
+		self.U = fixed_base(U)
 		self.value_bytes = value_bytes
 		self.memo_bytes = memo_bytes
 
@@ -57,7 +57,7 @@ class MintTransaction:
 				schnorr.SchnorrParameters(params.H),
 				self.output.C - Scalar(self.value)*params.G
 			),
-			schnorr.SchnorrWitness(hash_to_scalar('val',self.output.k*self.output.Q1))
+			schnorr.SchnorrWitness(hash_bytes_to_scalar('val',self.output.k*self.output.Q1))
 		)
 
 	def verify(self,params):
@@ -14,10 +14,18 @@ class ParallelParameters:
 		if not isinstance(m,int) or not m > 1:
 			raise TypeError('Bad type or value for parameter m!')
 		
-		self.F = F
+		self.F = fixed_base(F)
 		self.n = n
 		self.m = m
 
+# Matrix commitment generators, derived once for each shape
+generator_cache = {}
+
+def generators(n,m):
+	if (n,m) not in generator_cache:
+		generator_cache[(n,m)] = [PointVector([hash_bytes_to_point('Gi',j,i) for i in range(n)]) for j in range(m)]
+	return generator_cache[(n,m)]
+
 class ParallelStatement:
 	def __init__(self,params,S,V,S1,V1):
 		if not isinstance(params,ParallelParameters):
@@ -40,7 +48,7 @@ class ParallelStatement:
 		self.V = V
 		self.S1 = S1
 		self.V1 = V1
-		self.Gi = [PointVector([hash_to_point('Gi',j,i) for i in range(n)]) for j in range(m)]
+		self.Gi = generators(n,m)
 
 class ParallelWitness:
 	def __init__(self,l,s,v):
@@ -57,7 +65,7 @@ class ParallelWitness:
 
 class ParallelProof:
 	def __repr__(self):
-		return repr(hash_to_scalar(
+		return repr(hash_bytes_to_scalar(
 			self.A,
 			self.B,
 			self.C,
@@ -112,11 +120,13 @@ class ParallelProof:
 
 # Pedersen matrix commitment
 def com_matrix(Gi,F,v,r):
-	C = r*F
+	scalars = ScalarVector([r])
+	points = PointVector([F])
 	for j in range(len(v)):
 		for i in range(len(v[0])):
-			C += Gi[j][i]*v[j][i]
-	return C
+			scalars.append(v[j][i])
+		points.extend(Gi[j])
+	return multiexp(scalars,points)
 
 # Kronecker delta
 def delta(x,y):
@@ -124,26 +134,65 @@ def delta(x,y):
 		return Scalar(1)
 	return Scalar(0)
 
-# Compute a convolution with a degree-one polynomial
-def convolve(x,y):
-	if not len(y) == 2:
-		raise ValueError('Convolution requires a degree-one polynomial!')
-
-	r = [Scalar(0)]*(len(x)+1)
-	for i in range(len(x)):
-		for j in range(len(y)):
-			r[i+j] += x[i]*y[j]
-
-	return r
-
-# Decompose a value with given base and size
+# Decompose a value with given base and size, least significant digit first
 def decompose(val,base,size):
 	r = []
-	for i in range(size-1,-1,-1):
-		slot = base**i
-		r.append(int(val/slot))
-		val -= slot*r[-1]
-	return list(reversed(r))
+	for _ in range(size):
+		val,digit = divmod(val,base)
+		r.append(digit)
+	return r
+
+# Compute the product of one entry from each row of a matrix, for every index
+#
+# Entry i is the product of f[j][i_j] over all rows j, where i_j is digit j of i in base len(f[0])
+# Each row multiplies the products built so far, so the expansion takes O(n^m) multiplications
+#
+# INPUTS
+#   f: matrix of integers reduced modulo l (list of list of int)
+# OUTPUTS
+#   list of int
+def tensor_products(f):
+	products = [1]
+	for row in reversed(f):
+		products = [product*f_ % l for product in products for f_ in row]
+	return products
+
+# Compute the coefficients of the polynomials p_k(X) = prod_j (a[j][k_j] + delta(l_j,k_j)*X) for every index k
+#
+# Indexes sharing their low digits share the partial products over those digits, which are extended one digit at a time in a depth-first traversal
+# The subtree for lowest digit i covers indexes i, i+n, i+2n, ..., so its columns line up with the slice [i::n] of the input set
+# Subtrees are produced one at a time, so only O(N*m/n) coefficients are held at once; the leading coefficient is not needed
+#
+# INPUTS
+#   a: blinders (list of list of Scalar)
+#   decomp_l: digits of the secret index (list of int)
+# OUTPUTS
+#   lowest digit and the coefficient columns of its subtree (generator of (int, list of list of int))
+def polynomial_columns(a,decomp_l):
+	m = len(a)
+	n = len(a[0])
+	a = [[a_.x for a_ in row] for row in a]
+
+	for i0 in range(n):
+		columns = [[0]*(n**(m-1)) for _ in range(m)]
+
+		# Partial products still to be extended: (digit, index within the subtree, coefficients)
+		stack = [(1,0,[a[0][i0],1 if i0 == decomp_l[0] else 0])]
+		while len(stack) > 0:
+			j,index,poly = stack.pop()
+			if j == m:
+				for k in range(m):
+					columns[k][index] = poly[k]
+				continue
+
+			for i in range(n):
+				next_poly = [c*a[j][i] % l for c in poly] + [0]
+				if i == decomp_l[j]:
+					for k in range(len(poly)):
+						next_poly[k+1] = (next_poly[k+1] + poly[k]) % l
+				stack.append((j+1,index + i*n**(j-1),next_poly))
+
+		yield i0,columns
 
 # Perform a commitment-to-zero proof
 def prove(statement,witness):
@@ -201,26 +250,28 @@ def prove(statement,witness):
 			a_sq[j][i] = -a[j][i]*a[j][i]
 	D = com_matrix(statement.Gi,statement.F,a_sq,rD)
 
-	# Compute p coefficients
-	p = [[] for _ in range(N)]
-	for k in range(N):
-		decomp_k = decompose(k,n,m)
-		p[k] = [a[0][decomp_k[0]],delta(decomp_l[0],decomp_k[0])]
-		
-		for j in range(1,m):
-			p[k] = convolve(p[k],[a[j][decomp_k[j]],delta(decomp_l[j],decomp_k[j])])
-
 	# Generate proof values
-	Gs = PointVector([Z for _ in range(m)])
-	Gv = PointVector([Z for _ in range(m)])
+	#
+	# Each subtree of p coefficients contributes a multiexp over its slice of the input set
+	# Each offset difference shares a coefficient sum, so S1 and V1 each contribute a single term after all subtrees
 	rho_S = ScalarVector([random_scalar() for _ in range(m)])
 	rho_V = ScalarVector([random_scalar() for _ in range(m)])
+	Gs_ = [Z]*m
+	Gv_ = [Z]*m
+	p_sum = [0]*m
+	for i,p in polynomial_columns(a,decomp_l):
+		S_i = statement.S[i::n]
+		V_i = statement.V[i::n]
+		for j in range(m):
+			p_j = scalar_vector(p[j])
+			p_sum[j] += sum(p[j])
+			Gs_[j] += multiexp(p_j,S_i)
+			Gv_[j] += multiexp(p_j,V_i)
+	Gs = PointVector()
+	Gv = PointVector()
 	for j in range(m):
-		for i in range(N):
-			Gs[j] += (statement.S[i] - statement.S1)*p[i][j]
-			Gv[j] += (statement.V[i] - statement.V1)*p[i][j]
-		Gs[j] += rho_S[j]*statement.F
-		Gv[j] += rho_V[j]*statement.F
+		Gs.append(Gs_[j] + multiexp(ScalarVector([-Scalar(p_sum[j]),rho_S[j]]),PointVector([statement.S1,statement.F])))
+		Gv.append(Gv_[j] + multiexp(ScalarVector([-Scalar(p_sum[j]),rho_V[j]]),PointVector([statement.V1,statement.F])))
 
 	# Challenge
 	tr = transcript.Transcript('Parallel Groth/Bootle')
@@ -255,17 +306,17 @@ def prove(statement,witness):
 	
 	return ParallelProof(A,B,C,D,Gs,Gv,f,zA,zC,zS,zV)
 
-# Verify a commitment-to-zero proof
-def verify(statement,proof):
-	# Check statement consistency
-	if not isinstance(statement,ParallelStatement):
-		raise TypeError('Bad type for parallel statement!')
-	if not isinstance(proof,ParallelProof):
-		raise TypeError('Bad type for parallel proof!')
-	
+# Reconstruct the verifier challenge and the full response matrix for a proof
+#
+# INPUTS
+#   statement: (ParallelStatement)
+#   proof: (ParallelProof)
+# OUTPUTS
+#   x: challenge (Scalar)
+#   f: response matrix (list of list of Scalar)
+def challenge_matrix(statement,proof):
 	n = statement.n
 	m = statement.m
-	N = n**m
 	f = [[Scalar(0) for _ in range(n)] for _ in range(m)]
 
 	# Transcript and challenge
@@ -287,12 +338,146 @@ def verify(statement,proof):
 	x = tr.challenge()
 
 	# Matrix reconstruction
+	if not len(proof.f) == m:
+		raise IndexError('Bad parallel proof size!')
 	for j in range(m):
+		if not len(proof.f[j]) == n-1:
+			raise IndexError('Bad parallel proof size!')
 		f[j][0] = x
 		for i in range(1,n):
 			f[j][i] = proof.f[j][i-1]
 			f[j][0] -= f[j][i]
 
+	return x,f
+
+# Weighted terms of the combined verification equation for a proof
+#
+# The proof is valid exactly when the multiscalar multiplication of its terms is the identity
+# Scalars for the matrix generators, the input sets and F are kept separate, so proofs over the same input sets can sum them
+class ParallelTerms:
+	def __init__(self,Gi,S,V,F,scalars,points):
+		self.Gi = Gi
+		self.S = S
+		self.V = V
+		self.F = F
+		self.scalars = scalars
+		self.points = points
+
+# Compute the randomly-weighted terms for all verification equations of a proof
+#
+# INPUTS
+#   statement: (ParallelStatement)
+#   proof: (ParallelProof)
+# OUTPUTS
+#   ParallelTerms
+def proof_terms(statement,proof):
+	m = statement.m
+	x,f = challenge_matrix(statement,proof)
+
+	w_AB = random_scalar(zero=False).x
+	w_CD = random_scalar(zero=False).x
+	w_S = random_scalar(zero=False).x
+	w_V = random_scalar(zero=False).x
+	x_ = x.x
+
+	# Matrix commitment generators
+	Gi = []
+	for row in f:
+		for f_ in row:
+			Gi.append((w_AB*f_.x + w_CD*f_.x*(x_ - f_.x)) % l)
+
+	# Commitment sets
+	products = tensor_products([[f_.x for f_ in row] for row in f])
+	total = sum(products) % l
+	S = [w_S*product % l for product in products]
+	V = [w_V*product % l for product in products]
+
+	# Proof elements
+	scalars = []
+	points = PointVector()
+	x_power = 1
+	for j in range(m):
+		scalars.append(-w_S*x_power % l)
+		points.append(proof.Gs[j])
+		scalars.append(-w_V*x_power % l)
+		points.append(proof.Gv[j])
+		x_power = x_power*x_ % l
+	scalars.append(-w_S*total % l)
+	points.append(statement.S1)
+	scalars.append(-w_V*total % l)
+	points.append(statement.V1)
+	scalars.append(-w_AB*x_ % l)
+	points.append(proof.B)
+	scalars.append(-w_AB % l)
+	points.append(proof.A)
+	scalars.append(-w_CD*x_ % l)
+	points.append(proof.C)
+	scalars.append(-w_CD % l)
+	points.append(proof.D)
+	F = (w_AB*proof.zA.x + w_CD*proof.zC.x - w_S*proof.zS.x - w_V*proof.zV.x) % l
+
+	return ParallelTerms(Gi,S,V,F,scalars,points)
+
+# Check that the terms of proofs over the same input sets sum to the identity using a single multiscalar multiplication
+#
+# INPUTS
+#   statement: any of the statements, for the shared generators and input sets (ParallelStatement)
+#   terms: (list of ParallelTerms)
+# OUTPUTS
+#   bool
+def check_terms(statement,terms):
+	N = len(statement.S)
+	Gi = [0]*(statement.n*statement.m)
+	S = [0]*N
+	V = [0]*N
+	F = 0
+	scalars = []
+	points = PointVector()
+
+	# Sum the scalars of the shared points
+	for terms_ in terms:
+		for i in range(len(Gi)):
+			Gi[i] += terms_.Gi[i]
+		for i in range(N):
+			S[i] += terms_.S[i]
+			V[i] += terms_.V[i]
+		F += terms_.F
+		scalars.extend(terms_.scalars)
+		points.extend(terms_.points)
+
+	scalars.extend([x % l for x in Gi])
+	for j in range(statement.m):
+		points.extend(statement.Gi[j])
+	scalars.extend([x % l for x in S])
+	points.extend(statement.S)
+	scalars.extend([x % l for x in V])
+	points.extend(statement.V)
+	scalars.append(F % l)
+	points.append(statement.F)
+
+	return multiexp(scalar_vector(scalars),points) == Z
+
+# Verify a commitment-to-zero proof
+#
+# By default, all verification equations are checked with a single multiexp
+# With combined unset, each equation is checked separately so a failure identifies the equation
+def verify(statement,proof,combined=True):
+	# Check statement consistency
+	if not isinstance(statement,ParallelStatement):
+		raise TypeError('Bad type for parallel statement!')
+	if not isinstance(proof,ParallelProof):
+		raise TypeError('Bad type for parallel proof!')
+
+	# Check all equations at once using a random linear combination
+	if combined:
+		if not check_terms(statement,[proof_terms(statement,proof)]):
+			raise ArithmeticError('Failed parallel verification!')
+		return True
+	
+	n = statement.n
+	m = statement.m
+	x,f = challenge_matrix(statement,proof)
+
 	# A/B check
 	if not com_matrix(statement.Gi,statement.F,f,proof.zA) == proof.B*x + proof.A:
 		raise ArithmeticError('Failed parallel A/B check!')
@@ -306,32 +491,47 @@ def verify(statement,proof):
 		raise ArithmeticError('Failed parallel C/D check!')
 
 	# Commitment check
-	scalars_S = ScalarVector([])
-	points_S = PointVector([])
-	scalars_V = ScalarVector([])
-	points_V = PointVector([])
-	scalar_S1_V1 = Scalar(0)
-	for i in range(N):
-		s = Scalar(1)
-		decomp_i = decompose(i,n,m)
-		for j in range(m):
-			s *= f[j][decomp_i[j]]
-		scalars_S.append(s)
-		scalars_V.append(s)
-		points_S.append(statement.S[i])
-		points_V.append(statement.V[i])
-		scalar_S1_V1 -= s
-	for j in range(m):
-		scalars_S.append(-x**j)
-		points_S.append(proof.Gs[j])
-		scalars_V.append(-x**j)
-		points_V.append(proof.Gv[j])
-	scalars_S.append(scalar_S1_V1)
-	scalars_V.append(scalar_S1_V1)
+	products = tensor_products([[f_.x for f_ in row] for row in f])
+	x_powers = [(-x**j).x for j in range(m)]
+	scalar_S1_V1 = -sum(products) % l
+	scalars_S = scalar_vector(products + x_powers + [scalar_S1_V1])
+	scalars_V = scalar_vector(products + x_powers + [scalar_S1_V1])
+	points_S = PointVector()
+	points_S.extend(statement.S)
+	points_S.extend(proof.Gs)
 	points_S.append(statement.S1)
+	points_V = PointVector()
+	points_V.extend(statement.V)
+	points_V.extend(proof.Gv)
 	points_V.append(statement.V1)
 	
 	if not multiexp(scalars_S,points_S) == proof.zS*statement.F or not multiexp(scalars_V,points_V) == proof.zV*statement.F:
 		raise ArithmeticError('Failed parallel commitment check!')
 
 	return True
+
+# Verify a batch of commitment-to-zero proofs over the same input sets
+#
+# Each proof has its own offsets S1 and V1, but the input sets are shared
+# The per-index scalars of all proofs are summed, so the input sets appear only once in the single multiexp
+def verify_batch(statements,proofs):
+	if not len(statements) == len(proofs):
+		raise IndexError('Parallel statement/proof length mismatch!')
+	if len(statements) == 0:
+		return True
+	for statement in statements:
+		if not isinstance(statement,ParallelStatement):
+			raise TypeError('Bad type for parallel statement!')
+		if statement.n != statements[0].n or statement.m != statements[0].m or statement.F != statements[0].F:
+			raise ValueError('Inconsistent parallel batch statements!')
+		if statement.S is not statements[0].S and statement.S != statements[0].S:
+			raise ValueError('Inconsistent parallel batch statements!')
+		if statement.V is not statements[0].V and statement.V != statements[0].V:
+			raise ValueError('Inconsistent parallel batch statements!')
+	for proof in proofs:
+		if not isinstance(proof,ParallelProof):
+			raise TypeError('Bad type for parallel proof!')
+
+	if not check_terms(statements[0],[proof_terms(statement,proof) for statement,proof in zip(statements,proofs)]):
+		raise ArithmeticError('Failed parallel verification!')
+	return True
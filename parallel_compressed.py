@@ -14,10 +14,18 @@ class ParallelCompressedParameters:
 		if not isinstance(m,int) or not m > 1:
 			raise TypeError('Bad type or value for parameter m!')
 		
-		self.F = F
+		self.F = fixed_base(F)
 		self.n = n
 		self.m = m
 
+# Matrix commitment generators, derived once for each shape
+generator_cache = {}
+
+def generators(n,m):
+	if (n,m) not in generator_cache:
+		generator_cache[(n,m)] = [PointVector([hash_bytes_to_point('Gi',j,i) for i in range(n)]) for j in range(m)]
+	return generator_cache[(n,m)]
+
 class ParallelCompressedStatement:
 	def __init__(self,params,S,V,S1,V1):
 		if not isinstance(params,ParallelCompressedParameters):
@@ -40,7 +48,7 @@ class ParallelCompressedStatement:
 		self.V = V
 		self.S1 = S1
 		self.V1 = V1
-		self.Gi = [PointVector([hash_to_point('Gi',j,i) for i in range(n)]) for j in range(m)]
+		self.Gi = generators(n,m)
 
 class ParallelCompressedWitness:
 	def __init__(self,l,s,v):
@@ -57,7 +65,7 @@ class ParallelCompressedWitness:
 
 class ParallelCompressedProof:
 	def __repr__(self):
-		return repr(hash_to_scalar(
+		return repr(hash_bytes_to_scalar(
 			self.A,
 			self.B,
 			self.C,
@@ -104,11 +112,13 @@ class ParallelCompressedProof:
 
 # Pedersen matrix commitment
 def com_matrix(Gi,F,v,r):
-	C = r*F
+	scalars = ScalarVector([r])
+	points = PointVector([F])
 	for j in range(len(v)):
 		for i in range(len(v[0])):
-			C += Gi[j][i]*v[j][i]
-	return C
+			scalars.append(v[j][i])
+		points.extend(Gi[j])
+	return multiexp(scalars,points)
 
 # Kronecker delta
 def delta(x,y):
@@ -116,26 +126,65 @@ def delta(x,y):
 		return Scalar(1)
 	return Scalar(0)
 
-# Compute a convolution with a degree-one polynomial
-def convolve(x,y):
-	if not len(y) == 2:
-		raise ValueError('Convolution requires a degree-one polynomial!')
+# Decompose a value with given base and size, least significant digit first
+def decompose(val,base,size):
+	r = []
+	for _ in range(size):
+		val,digit = divmod(val,base)
+		r.append(digit)
+	return r
+
+# Compute the product of one entry from each row of a matrix, for every index
+#
+# Entry i is the product of f[j][i_j] over all rows j, where i_j is digit j of i in base len(f[0])
+# Each row multiplies the products built so far, so the expansion takes O(n^m) multiplications
+#
+# INPUTS
+#   f: matrix of integers reduced modulo l (list of list of int)
+# OUTPUTS
+#   list of int
+def tensor_products(f):
+	products = [1]
+	for row in reversed(f):
+		products = [product*f_ % l for product in products for f_ in row]
+	return products
+
+# Compute the coefficients of the polynomials p_k(X) = prod_j (a[j][k_j] + delta(l_j,k_j)*X) for every index k
+#
+# Indexes sharing their low digits share the partial products over those digits, which are extended one digit at a time in a depth-first traversal
+# The subtree for lowest digit i covers indexes i, i+n, i+2n, ..., so its columns line up with the slice [i::n] of the input set
+# Subtrees are produced one at a time, so only O(N*m/n) coefficients are held at once; the leading coefficient is not needed
+#
+# INPUTS
+#   a: blinders (list of list of Scalar)
+#   decomp_l: digits of the secret index (list of int)
+# OUTPUTS
+#   lowest digit and the coefficient columns of its subtree (generator of (int, list of list of int))
+def polynomial_columns(a,decomp_l):
+	m = len(a)
+	n = len(a[0])
+	a = [[a_.x for a_ in row] for row in a]
 
-	r = [Scalar(0)]*(len(x)+1)
-	for i in range(len(x)):
-		for j in range(len(y)):
-			r[i+j] += x[i]*y[j]
+	for i0 in range(n):
+		columns = [[0]*(n**(m-1)) for _ in range(m)]
 
-	return r
+		# Partial products still to be extended: (digit, index within the subtree, coefficients)
+		stack = [(1,0,[a[0][i0],1 if i0 == decomp_l[0] else 0])]
+		while len(stack) > 0:
+			j,index,poly = stack.pop()
+			if j == m:
+				for k in range(m):
+					columns[k][index] = poly[k]
+				continue
 
-# Decompose a value with given base and size
-def decompose(val,base,size):
-	r = []
-	for i in range(size-1,-1,-1):
-		slot = base**i
-		r.append(int(val/slot))
-		val -= slot*r[-1]
-	return list(reversed(r))
+			for i in range(n):
+				next_poly = [c*a[j][i] % l for c in poly] + [0]
+				if i == decomp_l[j]:
+					for k in range(len(poly)):
+						next_poly[k+1] = (next_poly[k+1] + poly[k]) % l
+				stack.append((j+1,index + i*n**(j-1),next_poly))
+
+		yield i0,columns
 
 # Perform a commitment-to-zero proof
 def prove(statement,witness):
@@ -193,15 +242,6 @@ def prove(statement,witness):
 			a_sq[j][i] = -a[j][i]*a[j][i]
 	D = com_matrix(statement.Gi,statement.F,a_sq,rD)
 
-	# Compute p coefficients
-	p = [[] for _ in range(N)]
-	for k in range(N):
-		decomp_k = decompose(k,n,m)
-		p[k] = [a[0][decomp_k[0]],delta(decomp_l[0],decomp_k[0])]
-		
-		for j in range(1,m):
-			p[k] = convolve(p[k],[a[j][decomp_k[j]],delta(decomp_l[j],decomp_k[j])])
-
 	# Challenge
 	tr = transcript.Transcript('Parallel Groth/Bootle')
 	tr.update(statement.F)
@@ -218,12 +258,29 @@ def prove(statement,witness):
 	mu = tr.challenge()
 
 	# Generate proof values
-	G = PointVector([Z for _ in range(m)])
+	#
+	# Each subtree of p coefficients contributes a multiexp over its slice of the input set
+	# Each offset difference shares a coefficient sum, so S1 and V1 each contribute a single term after all subtrees
 	rho = ScalarVector([random_scalar() for _ in range(m)])
+	G_ = [Z]*m
+	p_sum = [0]*m
+	for i,p in polynomial_columns(a,decomp_l):
+		points = PointVector()
+		points.extend(statement.S[i::n])
+		points.extend(statement.V[i::n])
+		for j in range(m):
+			p_j = scalar_vector(p[j])
+			p_sum[j] += sum(p[j])
+			scalars = ScalarVector()
+			scalars.extend(p_j)
+			scalars.extend(p_j*mu)
+			G_[j] += multiexp(scalars,points)
+	G = PointVector()
 	for j in range(m):
-		for i in range(N):
-			G[j] += ((statement.S[i] - statement.S1) + mu*(statement.V[i] - statement.V1))*p[i][j]
-		G[j] += rho[j]*statement.F
+		G.append(G_[j] + multiexp(
+			ScalarVector([-Scalar(p_sum[j]),-mu*Scalar(p_sum[j]),rho[j]]),
+			PointVector([statement.S1,statement.V1,statement.F])
+		))
 
 	# Challenge
 	tr.update(G)
@@ -243,7 +300,10 @@ def prove(statement,witness):
 	return ParallelCompressedProof(A,B,C,D,G,f,zA,zC,z)
 
 # Verify a commitment-to-zero proof
-def verify(statement,proof):
+#
+# By default, all verification equations are checked with a single multiexp
+# With combined unset, each equation is checked separately so a failure identifies the equation
+def verify(statement,proof,combined=True):
 	# Check statement consistency
 	if not isinstance(statement,ParallelCompressedStatement):
 		raise TypeError('Bad type for parallel statement!')
@@ -252,7 +312,6 @@ def verify(statement,proof):
 	
 	n = statement.n
 	m = statement.m
-	N = n**m
 	f = [[Scalar(0) for _ in range(n)] for _ in range(m)]
 
 	# Transcript and challenges
@@ -273,12 +332,64 @@ def verify(statement,proof):
 	x = tr.challenge()
 
 	# Matrix reconstruction
+	if not len(proof.f) == m:
+		raise IndexError('Bad parallel proof size!')
 	for j in range(m):
+		if not len(proof.f[j]) == n-1:
+			raise IndexError('Bad parallel proof size!')
 		f[j][0] = x
 		for i in range(1,n):
 			f[j][i] = proof.f[j][i-1]
 			f[j][0] -= f[j][i]
 
+	# Check all equations at once using a random linear combination
+	if combined:
+		w_AB = random_scalar(zero=False).x
+		w_CD = random_scalar(zero=False).x
+		w_S = random_scalar(zero=False).x
+		x_ = x.x
+		scalars = []
+		points = PointVector()
+
+		# Matrix commitment generators
+		for j in range(m):
+			for i in range(n):
+				f_ = f[j][i].x
+				scalars.append((w_AB*f_ + w_CD*f_*(x_ - f_)) % l)
+			points.extend(statement.Gi[j])
+
+		# Commitment sets
+		products = tensor_products([[f_.x for f_ in row] for row in f])
+		total = sum(products) % l
+		scalars.extend([w_S*product % l for product in products])
+		points.extend(statement.S)
+		scalars.extend([w_S*mu.x*product % l for product in products])
+		points.extend(statement.V)
+		x_power = 1
+		for j in range(m):
+			scalars.append(-w_S*x_power % l)
+			points.append(proof.G[j])
+			x_power = x_power*x_ % l
+		scalars.append(-w_S*total % l)
+		points.append(statement.S1)
+		scalars.append(-w_S*mu.x*total % l)
+		points.append(statement.V1)
+
+		# Proof elements
+		scalars.append(-w_AB*x_ % l)
+		points.append(proof.B)
+		scalars.append(-w_AB % l)
+		points.append(proof.A)
+		scalars.append(-w_CD*x_ % l)
+		points.append(proof.C)
+		scalars.append(-w_CD % l)
+		points.append(proof.D)
+		scalars.append((w_AB*proof.zA.x + w_CD*proof.zC.x - w_S*proof.z.x) % l)
+		points.append(statement.F)
+		if not multiexp(scalar_vector(scalars),points) == Z:
+			raise ArithmeticError('Failed parallel verification!')
+		return True
+
 	# A/B check
 	if not com_matrix(statement.Gi,statement.F,f,proof.zA) == proof.B*x + proof.A:
 		raise ArithmeticError('Failed parallel A/B check!')
@@ -292,27 +403,17 @@ def verify(statement,proof):
 		raise ArithmeticError('Failed parallel C/D check!')
 
 	# Commitment check
-	scalars = ScalarVector([])
-	points = PointVector([])
-	scalar_S1 = Scalar(0)
-	scalar_V1 = Scalar(0)
-	for i in range(N):
-		s = Scalar(1)
-		decomp_i = decompose(i,n,m)
-		for j in range(m):
-			s *= f[j][decomp_i[j]]
-		scalars.append(s)
-		points.append(statement.S[i])
-		scalars.append(mu*s)
-		points.append(statement.V[i])
-		scalar_S1 -= s
-		scalar_V1 -= mu*s
+	products = tensor_products([[f_.x for f_ in row] for row in f])
+	scalars = scalar_vector(products + [product*mu.x % l for product in products])
+	points = PointVector()
+	points.extend(statement.S)
+	points.extend(statement.V)
 	for j in range(m):
 		scalars.append(-x**j)
 		points.append(proof.G[j])
-	scalars.append(scalar_S1)
+	scalars.append(Scalar(-sum(products)))
 	points.append(statement.S1)
-	scalars.append(scalar_V1)
+	scalars.append(-mu*Scalar(sum(products)))
 	points.append(statement.V1)
 	if not multiexp(scalars,points) == proof.z*statement.F:
 		raise ArithmeticError('Failed parallel commitment check!')
@@ -11,7 +11,7 @@
 
 import address
 import coin
-from dumb25519 import Point, Scalar, hash_to_scalar, random_scalar
+from dumb25519 import Point, Scalar, fixed_base, hash_bytes_to_scalar, random_scalar
 import schnorr
 import transcript
 import util
@@ -27,9 +27,9 @@ class PayParameters:
 		if not isinstance(value_bytes,int) or value_bytes < 1:
 			raise ValueError('Bad type or value for parameter value_bytes!')
 		
-		self.F = F
-		self.G = G
-		self.H = H
+		self.F = fixed_base(F)
+		self.G = fixed_base(G)
+		self.H = fixed_base(H)
 		self.value_bytes = value_bytes
 
 class PayStatement:
@@ -122,20 +122,20 @@ def prove(statement,witness):
 		raise ArithmeticError('Invalid pay statement!')
 	if not statement.K_div == witness.k*statement.F:
 		raise ArithmeticError('Invalid pay statement!')
-	if not statement.coin.S == hash_to_scalar('ser',statement.K_der)*statement.F + statement.public.Q2:
+	if not statement.coin.S == hash_bytes_to_scalar('ser',statement.K_der)*statement.F + statement.public.Q2:
 		raise ArithmeticError('Invalid pay statement!')
 	if util.view_tag(statement.K_der) != statement.coin.view_tag:
 		raise ArithmeticError('Invalid pay statement!')
 
 	# Decrypt recipient data
-	aead_key = hash_to_scalar('aead',statement.K_der)
+	aead_key = hash_bytes_to_scalar('aead',statement.K_der)
 	data_bytes = util.aead_decrypt(aead_key,'Spend recipient data',statement.coin.enc)
 	if data_bytes is not None:
 		value = int.from_bytes(data_bytes[:statement.value_bytes],'little')
 	else:
 		raise ArithmeticError('Bad recipient data!')
 	
-	if not statement.coin.C == Scalar(value)*statement.G + hash_to_scalar('val',statement.K_der)*statement.H:
+	if not statement.coin.C == Scalar(value)*statement.G + hash_bytes_to_scalar('val',statement.K_der)*statement.H:
 		raise ArithmeticError('Invalid pay statement!')
 	
 	r = random_scalar()
@@ -158,11 +158,11 @@ def verify(statement,proof):
 	
 	c = challenge(statement,proof.A1,proof.A2,proof.A3)
 
-	if not proof.A1 + c*statement.coin.K == proof.t*statement.public.Q0:
+	if not proof.A1 + statement.coin.K.multiply(c,vartime=True) == statement.public.Q0.multiply(proof.t,vartime=True):
 		raise ArithmeticError('Failed pay verification!')
-	if not proof.A2 + c*statement.K_der == proof.t*statement.public.Q1:
+	if not proof.A2 + statement.K_der.multiply(c,vartime=True) == statement.public.Q1.multiply(proof.t,vartime=True):
 		raise ArithmeticError('Failed pay verification!')
-	if not proof.A3 + c*statement.K_div == proof.t*statement.F:
+	if not proof.A3 + statement.K_div.multiply(c,vartime=True) == statement.F.multiply(proof.t,vartime=True):
 		raise ArithmeticError('Failed pay verification!')
 	
 	# Test view tag
@@ -170,14 +170,14 @@ def verify(statement,proof):
 		raise ArithmeticError('Failed pay verification!')
 
 	# Decrypt recipient data
-	aead_key = hash_to_scalar('aead',statement.K_der)
+	aead_key = hash_bytes_to_scalar('aead',statement.K_der)
 	data_bytes = util.aead_decrypt(aead_key,'Spend recipient data',statement.coin.enc)
 	if data_bytes is not None:
 		value = int.from_bytes(data_bytes[:statement.value_bytes],'little')
 	else:
 		raise ArithmeticError('Bad recipient data!')
 
-	if not statement.coin.C == Scalar(value)*statement.G + hash_to_scalar('val',statement.K_der)*statement.H:
+	if not statement.coin.C == Scalar(value)*statement.G + hash_bytes_to_scalar('val',statement.K_der)*statement.H:
 		raise ArithmeticError('Failed pay verification!')
 	
 	# Check diversifier
@@ -190,7 +190,7 @@ def verify(statement,proof):
 		raise ArithmeticError('Failed pay verification!')
 
 	# Test serial number and value commitments
-	if not statement.coin.S == hash_to_scalar('ser',statement.K_der)*statement.F + statement.public.Q2:
+	if not statement.coin.S == hash_bytes_to_scalar('ser',statement.K_der)*statement.F + statement.public.Q2:
 		raise ArithmeticError('Failed pay verification!')
-	if not statement.coin.C == Scalar(value)*statement.G + hash_to_scalar('val',statement.K_der)*statement.H:
+	if not statement.coin.C == Scalar(value)*statement.G + hash_bytes_to_scalar('val',statement.K_der)*statement.H:
 		raise ArithmeticError('Failed pay verification!')
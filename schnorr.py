@@ -2,7 +2,7 @@
 #
 # {G,Y ; (y) | Y = yG}
 
-from dumb25519 import Point, Scalar, hash_to_scalar, random_scalar
+from dumb25519 import Point, Scalar, fixed_base, hash_bytes_to_scalar, random_scalar
 import transcript
 
 class SchnorrParameters:
@@ -10,7 +10,7 @@ class SchnorrParameters:
 		if not isinstance(G,Point):
 			raise TypeError('Bad type for parameter G!')
 		
-		self.G = G
+		self.G = fixed_base(G)
 
 class SchnorrStatement:
 	def __init__(self,params,Y):
@@ -31,7 +31,7 @@ class SchnorrWitness:
 
 class SchnorrProof:
 	def __repr__(self):
-		return repr(hash_to_scalar(
+		return repr(hash_bytes_to_scalar(
 			self.c,
 			self.t
 		))
@@ -87,7 +87,7 @@ def verify(statement,proof):
 	if not isinstance(proof,SchnorrProof):
 		raise TypeError('Bad type for Schnorr proof!')
 	
-	c = challenge(statement,proof.t*statement.G - proof.c*statement.Y)
+	c = challenge(statement,statement.G.multiply(proof.t,vartime=True) - statement.Y.multiply(proof.c,vartime=True))
 
 	if not proof.c == c:
 		raise ArithmeticError('Failed Schnorr verification!')
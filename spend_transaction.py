@@ -5,7 +5,7 @@ import bpplus
 import chaum
 import coin
 import dumb25519
-from dumb25519 import Point, Scalar, PointVector, ScalarVector, hash_to_scalar
+from dumb25519 import Point, Scalar, PointVector, ScalarVector, fixed_base, hash_bytes_to_scalar
 import parallel
 import schnorr
 
@@ -28,10 +28,10 @@ class ProtocolParameters:
 		if not isinstance(m,int) or m < 1:
 			raise ValueError('Bad type or value for parameter m!')
 		
-		self.F = F
-		self.G = G
-		self.H = H
-		self.U = U
+		self.F = fixed_base(F)
+		self.G = fixed_base(G)
+		self.H = fixed_base(H)
+		self.U = fixed_base(U)
 		self.value_bytes = value_bytes
 		self.memo_bytes = memo_bytes
 		self.n = n
@@ -60,6 +60,8 @@ class SpendTransaction:
 				raise TypeError('Bad type for output coin!')
 			if not output.is_output:
 				raise ValueError('Output coin is not flagged as output!')
+			if output.aggregate != outputs[0].aggregate:
+				raise ValueError('Output coins must all use aggregated range proofs or none!')
 
 		w = len(indexes)
 		t = len(outputs)
@@ -71,8 +73,12 @@ class SpendTransaction:
 		self.C1 = PointVector() # value commitment offsets
 		self.T = PointVector() # tags
 		self.parallel = [] # parallel one-of-many proofs
+		self.range = None # aggregated output range proof
 
 		# Spends
+		parallel_params = parallel.ParallelParameters(params.H,params.n,params.m)
+		S = PointVector([input.S for input in inputs])
+		C = PointVector([input.C for input in inputs])
 		for u in range(w):
 			input = inputs[indexes[u]]
 
@@ -85,13 +91,7 @@ class SpendTransaction:
 
 			# Parallel one-of-many proof
 			self.parallel.append(parallel.prove(
-				parallel.ParallelStatement(
-					parallel.ParallelParameters(params.H,params.n,params.m),
-					PointVector([input.S for input in inputs]),
-					PointVector([input.C for input in inputs]),
-					self.S1[u],
-					self.C1[u]
-				),
+				parallel.ParallelStatement(parallel_params,S,C,self.S1[u],self.C1[u]),
 				parallel.ParallelWitness(
 					indexes[u],
 					input.delegation.s1,
@@ -99,6 +99,25 @@ class SpendTransaction:
 				)
 			))
 
+		# Aggregated output range proof
+		if t > 0 and outputs[0].aggregate:
+			range_statement = bpplus.RangeStatement(
+				bpplus.RangeParameters(params.G,params.H,8*params.value_bytes),
+				PointVector([output.C for output in outputs])
+			)
+			self.range = bpplus.prove(
+				range_statement,
+				bpplus.RangeWitness(
+					ScalarVector([Scalar(output.value) for output in outputs]),
+					ScalarVector([hash_bytes_to_scalar('val',output.k*output.Q1) for output in outputs])
+				)
+			)
+			range_C = range_statement.padded()
+			for j in range(t):
+				outputs[j].range = self.range
+				outputs[j].range_C = range_C
+				outputs[j].range_index = j
+
 		# Balance statement input value
 		b_st = dumb25519.Z
 		for u in range(w):
@@ -111,9 +130,9 @@ class SpendTransaction:
 		b_w = Scalar(0)
 		for u in range(w):
 			input = inputs[indexes[u]]
-			b_w += hash_to_scalar('val1',input.delegation.id,input.s,full.s1,full.s2)
+			b_w += hash_bytes_to_scalar('val1',input.delegation.id,input.s,full.s1,full.s2)
 		for j in range(t):
-			b_w -= hash_to_scalar('val',outputs[j].k*outputs[j].Q1)
+			b_w -= hash_bytes_to_scalar('val',outputs[j].k*outputs[j].Q1)
 
 		# Balance proof
 		self.balance = schnorr.prove(
@@ -122,7 +141,19 @@ class SpendTransaction:
 		)
 
 		# Aggregated modified Chaum-Pedersen proof
-		mu = hash_to_scalar(
+		mu = self.challenge()
+
+		chaum_x = ScalarVector([inputs[indexes[u]].s for u in range(w)])
+		chaum_y = ScalarVector([spend.r]*w)
+		chaum_z = ScalarVector([Scalar(0) - hash_bytes_to_scalar('ser1',inputs[indexes[u]].delegation.id,inputs[indexes[u]].s,full.s1,full.s2) for u in range(w)])
+		self.chaum = chaum.prove(
+			chaum.ChaumStatement(chaum.ChaumParameters(params.F,params.G,params.H,params.U),mu,self.S1,self.T),
+			chaum.ChaumWitness(chaum_x,chaum_y,chaum_z)
+		)
+
+	# Challenge binding the transaction data, including any aggregated range proof
+	def challenge(self):
+		data = [
 			self.inputs,
 			self.outputs,
 			self.fee,
@@ -131,17 +162,28 @@ class SpendTransaction:
 			self.T,
 			self.parallel,
 			self.balance
-		)
+		]
+		if self.range is not None:
+			data.append(self.range)
+		return hash_bytes_to_scalar(*data)
 
-		chaum_x = ScalarVector([inputs[indexes[u]].s for u in range(w)])
-		chaum_y = ScalarVector([spend.r]*w)
-		chaum_z = ScalarVector([Scalar(0) - hash_to_scalar('ser1',inputs[indexes[u]].delegation.id,inputs[indexes[u]].s,full.s1,full.s2) for u in range(w)])
-		self.chaum = chaum.prove(
-			chaum.ChaumStatement(chaum.ChaumParameters(params.F,params.G,params.H,params.U),mu,self.S1,self.T),
-			chaum.ChaumWitness(chaum_x,chaum_y,chaum_z)
-		)
+	# Range statements and proofs for the outputs
+	def range_proofs(self,params):
+		range_params = bpplus.RangeParameters(params.G,params.H,8*params.value_bytes)
+		if self.range is not None:
+			for output in self.outputs:
+				if output.range is not self.range:
+					raise ValueError('Output coin does not use the aggregated range proof!')
+			return [bpplus.RangeStatement(range_params,PointVector([output.C for output in self.outputs]))],[self.range]
+
+		statements = [bpplus.RangeStatement(range_params,PointVector([output.C])) for output in self.outputs]
+		proofs = [output.range for output in self.outputs]
+		return statements,proofs
 
-	def verify(self,params,tags=None):
+	# Verify the transaction
+	#
+	# Range proofs can be skipped here when they are checked separately using verify_range_batch
+	def verify(self,params,tags=None,verify_range=True):
 		if not isinstance(params,ProtocolParameters):
 			raise TypeError('Bad type for parameters!')
 
@@ -157,51 +199,90 @@ class SpendTransaction:
 		w = len(self.T)
 		t = len(self.outputs)
 
-		mu = hash_to_scalar(
-			self.inputs,
-			self.outputs,
-			self.fee,
-			self.S1,
-			self.C1,
-			self.T,
-			self.parallel,
-			self.balance
-		)
+		mu = self.challenge()
 
-		# Check input proofs
-		for u in range(w):
-			parallel.verify(
-				parallel.ParallelStatement(
-					parallel.ParallelParameters(params.H,params.n,params.m),
-					PointVector([input.S for input in self.inputs]),
-					PointVector([input.C for input in self.inputs]),
-					self.S1[u],
-					self.C1[u]
-				),
-				self.parallel[u]
+		# Check input proofs, which share the cover set
+		with dumb25519.phase('parallel'):
+			parallel_params = parallel.ParallelParameters(params.H,params.n,params.m)
+			S = PointVector([input.S for input in self.inputs])
+			C = PointVector([input.C for input in self.inputs])
+			parallel.verify_batch(
+				[parallel.ParallelStatement(parallel_params,S,C,self.S1[u],self.C1[u]) for u in range(w)],
+				self.parallel
 			)
 
-		chaum.verify(
-			chaum.ChaumStatement(chaum.ChaumParameters(params.F,params.G,params.H,params.U),mu,self.S1,self.T),
-			self.chaum
-		)
+		with dumb25519.phase('chaum'):
+			chaum.verify(
+				chaum.ChaumStatement(chaum.ChaumParameters(params.F,params.G,params.H,params.U),mu,self.S1,self.T),
+				self.chaum
+			)
 		
 		# Check output proofs
-		for j in range(t):
-			bpplus.verify(
-				[bpplus.RangeStatement(bpplus.RangeParameters(params.G,params.H,8*params.value_bytes),PointVector([self.outputs[j].C]))],
-				[self.outputs[j].range]
-			)
+		if verify_range:
+			with dumb25519.phase('bpplus'):
+				statements,proofs = self.range_proofs(params)
+				if len(proofs) > 0:
+					bpplus.verify(statements,proofs)
 
 		# Check balance
-		b_st = dumb25519.Z
-		for u in range(w):
-			b_st += self.C1[u]
-		for j in range(t):
-			b_st -= self.outputs[j].C
-		b_st -= Scalar(self.fee)*params.G
+		with dumb25519.phase('schnorr'):
+			b_st = dumb25519.Z
+			for u in range(w):
+				b_st += self.C1[u]
+			for j in range(t):
+				b_st -= self.outputs[j].C
+			b_st -= Scalar(self.fee)*params.G
 
-		schnorr.verify(
-			schnorr.SchnorrStatement(schnorr.SchnorrParameters(params.H),b_st),
-			self.balance
-		)
+			schnorr.verify(
+				schnorr.SchnorrStatement(schnorr.SchnorrParameters(params.H),b_st),
+				self.balance
+			)
+
+# Verify the range proofs of many spend transactions and coins in a single batch
+#
+# Proofs shared by several coins of an aggregated transaction are only included once
+#
+# INPUTS
+#   params: (ProtocolParameters)
+#   transactions: (list of SpendTransaction)
+#   coins: non-mint coins (list of coin.Coin)
+def verify_range_batch(params,transactions,coins=None):
+	if not isinstance(params,ProtocolParameters):
+		raise TypeError('Bad type for parameters!')
+	if coins is None:
+		coins = []
+
+	statements = []
+	proofs = []
+	for transaction in transactions:
+		if not isinstance(transaction,SpendTransaction):
+			raise TypeError('Bad type for spend transaction!')
+		statements_,proofs_ = transaction.range_proofs(params)
+		statements.extend(statements_)
+		proofs.extend(proofs_)
+
+	range_params = bpplus.RangeParameters(params.G,params.H,8*params.value_bytes)
+	seen = set(id(proof) for proof in proofs)
+	for coin_ in coins:
+		if not isinstance(coin_,coin.Coin):
+			raise TypeError('Bad type for coin!')
+		if coin_.is_mint:
+			raise ValueError('Mint coins do not have range proofs!')
+		if coin_.range is None:
+			raise ValueError('Coin has no range proof!')
+		if coin_.aggregate and not coin_.range_C[coin_.range_index] == coin_.C:
+			raise ValueError('Coin is not in its aggregated range proof!')
+		if id(coin_.range) in seen:
+			continue
+		seen.add(id(coin_.range))
+
+		if coin_.aggregate:
+			statements.append(bpplus.RangeStatement(range_params,coin_.range_C))
+		else:
+			statements.append(bpplus.RangeStatement(range_params,PointVector([coin_.C])))
+		proofs.append(coin_.range)
+
+	if len(proofs) == 0:
+		return
+	with dumb25519.phase('bpplus'):
+		bpplus.verify(statements,proofs)
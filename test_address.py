@@ -1,5 +1,5 @@
 import address
-from dumb25519 import hash_to_scalar, random_point
+from dumb25519 import hash_bytes_to_scalar, random_point
 import unittest
 
 class TestAddress(unittest.TestCase):
@@ -16,12 +16,12 @@ class TestAddress(unittest.TestCase):
 		self.assertEqual(full.s1,spend.s1)
 		self.assertEqual(full.s2,spend.s2)
 		self.assertEqual(full.D,spend.r*params.G)
-		self.assertEqual(public.Q0,hash_to_scalar('Q0',spend.s1,lookahead)*params.F)
+		self.assertEqual(public.Q0,hash_bytes_to_scalar('Q0',spend.s1,lookahead)*params.F)
 		self.assertEqual(public.Q1,spend.s1*public.Q0)
-		self.assertEqual(public.Q2,(hash_to_scalar('Q2',spend.s1,lookahead) + spend.s2)*params.F + spend.r*params.G)
+		self.assertEqual(public.Q2,(hash_bytes_to_scalar('Q2',spend.s1,lookahead) + spend.s2)*params.F + spend.r*params.G)
 
 		for i in range(lookahead+2):
-			entry = (hash_to_scalar('Q2',spend.s1,i) + spend.s2)*params.F + spend.r*params.G
+			entry = (hash_bytes_to_scalar('Q2',spend.s1,i) + spend.s2)*params.F + spend.r*params.G
 			if i > lookahead:
 				with self.assertRaises(IndexError):
 					incoming.get_diversifier(entry)
@@ -1,6 +1,9 @@
 import bpplus
 from dumb25519 import random_point, random_scalar, Scalar, ScalarVector, PointVector
+from hashlib import blake2b
 from random import randrange
+import os
+import tempfile
 import unittest
 
 class TestBPPlus(unittest.TestCase):
@@ -25,5 +28,137 @@ class TestBPPlus(unittest.TestCase):
 
 		bpplus.verify(statements,proofs)
 
+		# A modified proof fails
+		proofs[0].r1 += Scalar(1)
+		with self.assertRaises(ArithmeticError):
+			bpplus.verify(statements,proofs)
+
+	def test_isolate(self):
+		params = bpplus.RangeParameters(random_point(),random_point(),4)
+		n_proofs = 5
+
+		statements = []
+		proofs = []
+		for _ in range(n_proofs):
+			v = ScalarVector([Scalar(randrange(0,2**params.N))])
+			r = ScalarVector([random_scalar()])
+			C = PointVector([v[0]*params.H + r[0]*params.G])
+			statement = bpplus.RangeStatement(params,C)
+			statements.append(statement)
+			proofs.append(bpplus.prove(statement,bpplus.RangeWitness(v,r)))
+
+		self.assertEqual(bpplus.verify(statements,proofs,isolate=True),[True]*n_proofs)
+
+		# Corrupt some proofs, including one with a malformed size
+		proofs[1].s1 += Scalar(1)
+		proofs[4].d1 += Scalar(1)
+		proofs[2].L = proofs[2].L[1:]
+		self.assertEqual(bpplus.verify(statements,proofs,isolate=True),[True,False,False,True,False])
+		with self.assertRaises(IndexError):
+			bpplus.verify(statements,proofs)
+
+	def test_mixed(self):
+		H = random_point()
+		G = random_point()
+
+		# Different bit lengths and numbers of commitments, including padded ones
+		statements = []
+		proofs = []
+		for N,M in [(4,1),(8,3),(2,4),(8,1)]:
+			params = bpplus.RangeParameters(H,G,N)
+			v = ScalarVector([Scalar(randrange(0,2**N)) for _ in range(M)])
+			r = ScalarVector([random_scalar() for _ in range(M)])
+			C = PointVector([v[i]*params.H + r[i]*params.G for i in range(M)])
+			statement = bpplus.RangeStatement(params,C)
+			statements.append(statement)
+			proofs.append(bpplus.prove(statement,bpplus.RangeWitness(v,r)))
+
+		self.assertEqual(len(proofs[1].L),5)
+		bpplus.verify(statements,proofs)
+
+		# Bit lengths must be powers of two
+		with self.assertRaises(ValueError):
+			bpplus.RangeStatement(bpplus.RangeParameters(H,G,3),PointVector([H]))
+
+	def test_challenge_products(self):
+		challenges = [random_scalar() for _ in range(3)]
+		products = bpplus.challenge_products([x.x for x in challenges],[x.invert().x for x in challenges])
+		for i in range(8):
+			expected = Scalar(1)
+			for j in range(3):
+				# The first challenge matches the most significant bit
+				expected *= challenges[j] if (i >> (2-j)) & 1 else challenges[j].invert()
+			self.assertEqual(Scalar(products[i]),expected)
+
+	def test_generator_table(self):
+		table = bpplus.GeneratorTable(8)
+		Gi,Hi = table.prefix(4)
+		self.assertEqual(len(Gi),4)
+		self.assertEqual(Gi[3],bpplus.hash_bytes_to_point('Gi',3))
+		self.assertEqual(Hi[3],bpplus.hash_bytes_to_point('Hi',3))
+
+		# Derived tables grow past their size
+		Gi,Hi = table.prefix(9)
+		self.assertEqual(Gi[8],bpplus.hash_bytes_to_point('Gi',8))
+		table = bpplus.GeneratorTable(8)
+
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory,'generators')
+			table.save(path)
+
+			# Sizes without a pinned digest need a trusted one
+			with self.assertRaises(ValueError):
+				bpplus.GeneratorTable(path=path)
+			digest = table.digest()
+			loaded = bpplus.GeneratorTable(path=path,digest=digest)
+			self.assertEqual(loaded.size,8)
+			Gi_,Hi_ = loaded.prefix(8)
+			self.assertEqual(Gi_,table.Gi)
+			self.assertEqual(Hi_,table.Hi)
+			with self.assertRaises(ValueError):
+				loaded.prefix(9)
+
+			# Statements can use a loaded table
+			params = bpplus.RangeParameters(random_point(),random_point(),4,loaded)
+			v = ScalarVector([Scalar(3),Scalar(5)])
+			r = ScalarVector([random_scalar(),random_scalar()])
+			C = PointVector([v[i]*params.H + r[i]*params.G for i in range(2)])
+			statement = bpplus.RangeStatement(params,C)
+			bpplus.verify([statement],[bpplus.prove(statement,bpplus.RangeWitness(v,r))])
+			loaded.data.close()
+
+			# Replacing an entry with a related point is caught
+			P = (table.Gi[0]*Scalar(7)).normalize()
+			with open(path,'r+b') as f:
+				f.seek(bpplus.GeneratorTable.header_bytes + 2*bpplus.GeneratorTable.record_bytes)
+				f.write(P.X.to_bytes(32,'little') + P.Y.to_bytes(32,'little'))
+			with self.assertRaises(ValueError):
+				bpplus.GeneratorTable(path=path,digest=digest)
+
+			# Entries off the curve are rejected even under a matching digest
+			with open(path,'r+b') as f:
+				f.seek(bpplus.GeneratorTable.header_bytes + 2*bpplus.GeneratorTable.record_bytes)
+				f.write((1).to_bytes(32,'little') + (1).to_bytes(32,'little'))
+			with open(path,'rb') as f:
+				data = f.read()
+			bad_digest = blake2b(data[bpplus.GeneratorTable.header_bytes:]).digest()
+			with open(path,'r+b') as f:
+				f.seek(bpplus.GeneratorTable.header_bytes - 64)
+				f.write(bad_digest)
+			bad = bpplus.GeneratorTable(path=path,digest=bad_digest)
+			with self.assertRaises(ValueError):
+				bad.prefix(3)
+			bad.data.close()
+
+			# Corrupted header
+			with open(path,'r+b') as f:
+				f.write(b'x')
+			with self.assertRaises(ValueError):
+				bpplus.GeneratorTable(path=path,digest=digest)
+
+	def test_pinned_digest(self):
+		size = bpplus.max_generators
+		self.assertEqual(bpplus.GeneratorTable(size).digest(),bpplus.pinned_digests[size])
+
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
@@ -1,3 +1,4 @@
+import dumb25519
 from dumb25519 import *
 import unittest
 
@@ -250,6 +251,27 @@ class TestScalar(unittest.TestCase):
         self.assertEqual(repr(Scalar(1)),'0100000000000000000000000000000000000000000000000000000000000000')
         self.assertEqual(repr(Scalar(l-1)),'ecd3f55c1a631258d69cf7a2def9de1400000000000000000000000000000010')
 
+    def test_bytes(self):
+        # Test encoding round trips
+        for s in [Scalar(0),Scalar(1),Scalar(l-1),random_scalar()]:
+            self.assertEqual(Scalar.from_bytes(s.to_bytes()),s)
+            self.assertEqual(s.to_bytes().hex(),repr(s))
+        s = random_scalar()
+        self.assertIs(s.to_bytes(),s.to_bytes())
+
+        # Test invalid decoding
+        with self.assertRaises(ValueError):
+            Scalar.from_bytes(l.to_bytes(32,'little'))
+        with self.assertRaises(TypeError):
+            Scalar.from_bytes(bytes(31))
+        with self.assertRaises(TypeError):
+            Scalar.from_bytes('00'*32)
+
+    def test_slots(self):
+        # Test that Scalars do not carry a per-instance dictionary
+        with self.assertRaises(AttributeError):
+            Scalar(0).foo = 0
+
     def test_int(self):
         # Test ingeger reconstruction
         self.assertEqual(int(Scalar(0)),0)
@@ -356,6 +378,19 @@ class TestPoint(unittest.TestCase):
         with self.assertRaises(TypeError):
             None - G
 
+    def test_double(self):
+        # Test doubling against addition
+        self.assertEqual(G.double(),G + G)
+        self.assertEqual(Z.double(),Z)
+        self.assertEqual((G + G + G).double(),G + G + G + G + G + G)
+
+    def test_normalize(self):
+        # Test that projective results normalize to the same affine point
+        P = G + G + G
+        self.assertEqual(P.normalize(),Point(P.x,P.y))
+        self.assertEqual(P.Z,1)
+        self.assertEqual(repr((G + G) - G),repr(G))
+
     def test_mul(self):
         # Test Point-Scalar multiplication
         self.assertEqual(G*Scalar(1),G)
@@ -375,11 +410,69 @@ class TestPoint(unittest.TestCase):
         with self.assertRaises(TypeError):
             None*G
 
+    def test_multiply(self):
+        # Test all window widths and both schedules against repeated addition
+        P = Z
+        for k in range(20):
+            for w in range(2,7):
+                self.assertEqual(G.multiply(Scalar(k),w),P)
+                self.assertEqual(G.multiply(Scalar(k),w,vartime=True),P)
+            P += G
+
+        # Test a large scalar against both schedules
+        self.assertEqual(G.multiply(Scalar(-1)),-G)
+        self.assertEqual(G.multiply(Scalar(-1),vartime=True),-G)
+
+        # Test invalid multiplication
+        with self.assertRaises(TypeError):
+            G.multiply(1)
+        with self.assertRaises(ValueError):
+            G.multiply(Scalar(1),1)
+
     def test_repr(self):
         # Test known representations
         self.assertEqual(repr(Z),'0100000000000000000000000000000000000000000000000000000000000000')
         self.assertEqual(repr(G),'5866666666666666666666666666666666666666666666666666666666666666')
 
+    def test_bytes(self):
+        # Test encoding round trips
+        for P in [Z,G,G + G,-G,random_point()]:
+            self.assertEqual(Point.from_bytes(P.to_bytes()),P)
+            self.assertEqual(P.to_bytes().hex(),repr(P))
+        P = G + G
+        self.assertIs(P.to_bytes(),P.to_bytes())
+
+        # Test invalid decoding
+        with self.assertRaises(TypeError):
+            Point.from_bytes(bytes(31))
+        with self.assertRaises(TypeError):
+            Point.from_bytes(repr(G))
+        with self.assertRaises(ValueError):
+            Point.from_bytes((2).to_bytes(32,'little')) # not on the curve
+        with self.assertRaises(ValueError):
+            Point.from_bytes((q+1).to_bytes(32,'little')) # non-canonical y-coordinate
+        with self.assertRaises(ValueError):
+            Point.from_bytes((1 + 2**255).to_bytes(32,'little')) # negative zero x-coordinate
+
+    def test_decompress_points(self):
+        # Test a batch with valid and invalid encodings
+        P = [random_point() for _ in range(3)]
+        encodings = [P[0].to_bytes(),(q+1).to_bytes(32,'little'),P[1].to_bytes(),(2).to_bytes(32,'little'),P[2].to_bytes(),bytes(31),None]
+        points,invalid = decompress_points(encodings)
+        self.assertEqual(invalid,[1,3,5,6])
+        self.assertEqual(len(points),len(encodings))
+        self.assertEqual(points[0],P[0])
+        self.assertEqual(points[2],P[1])
+        self.assertEqual(points[4],P[2])
+        for i in invalid:
+            self.assertIsNone(points[i])
+        self.assertEqual(decompress_points([]),([],[]))
+
+    def test_slots(self):
+        # Test that Points do not carry a per-instance dictionary
+        with self.assertRaises(AttributeError):
+            (G + G).foo = 0
+
     def test_neg(self):
         # Test negation
         self.assertEqual(-G,Z-G)
@@ -559,6 +652,19 @@ class TestPointVector(unittest.TestCase):
         self.assertEqual(repr(PointVector([Z,G])),'[0100000000000000000000000000000000000000000000000000000000000000, 5866666666666666666666666666666666666666666666666666666666666666]')
         self.assertEqual(repr(PointVector()),'[]')
 
+    def test_normalize(self):
+        # Test batch normalization of projective Points
+        P = PointVector([G + G,Z,G.double() + G,G])
+        expected = [repr(point) for point in P.points]
+        P.normalize()
+        self.assertEqual(P.Z,[1,1,1,1])
+        self.assertEqual([repr(point) for point in P.points],expected)
+        self.assertEqual(P,PointVector([G + G,Z,G + G + G,G]))
+        self.assertEqual(PointVector().normalize(),PointVector())
+
+        # Test construction from coordinates
+        self.assertEqual(point_vector([(G.X,G.Y,G.Z,G.T)]),PointVector([G]))
+
     def test_neg(self):
         # Test negation
         self.assertEqual(-PointVector(),PointVector())
@@ -750,6 +856,19 @@ class TestScalarVector(unittest.TestCase):
         with self.assertRaises(ZeroDivisionError):
             ScalarVector([Scalar(0),Scalar(1),Scalar(2)]).invert()
 
+    def test_values(self):
+        # Test that raw values are reduced and round-trip through Scalars
+        s = ScalarVector([Scalar(-1),Scalar(l),Scalar(2)])
+        self.assertEqual(s.values,[l-1,0,2])
+        self.assertEqual(s.scalars,[Scalar(-1),Scalar(0),Scalar(2)])
+        self.assertEqual(scalar_vector([l-1,0,2]),s)
+
+        # Test bulk operations against elementwise Scalar arithmetic
+        t = ScalarVector([random_scalar() for _ in range(3)])
+        self.assertEqual((s*t).scalars,[s[i]*t[i] for i in range(3)])
+        self.assertEqual(s**t,s[0]*t[0] + s[1]*t[1] + s[2]*t[2])
+        self.assertEqual(t.sum(),t[0] + t[1] + t[2])
+
     def test_neg(self):
         # Test negation
         self.assertEqual(-ScalarVector(),ScalarVector())
@@ -804,6 +923,61 @@ class TestHash(unittest.TestCase):
         with self.assertRaises(TypeError):
             hash_to_scalar(0,None)
 
+    def test_elligator2(self):
+        for r in [0,1,2,12345,q-1]:
+            P = elligator2(r)
+            self.assertTrue(P.on_curve())
+
+    def test_hash_bytes_to_point(self):
+        # Results lie in the prime-order subgroup
+        for data in [b'',b'test message',G,Scalar(0),[0,1]]:
+            H = hash_bytes_to_point(data)
+            self.assertTrue(H.on_curve())
+            self.assertNotEqual(H,Z)
+            self.assertEqual(H*Scalar(l-1) + H,Z)
+
+        # Deterministic and domain separated
+        self.assertEqual(hash_bytes_to_point('Gi',0),hash_bytes_to_point('Gi',0))
+        self.assertNotEqual(hash_bytes_to_point('Gi',0),hash_bytes_to_point('Gi',1))
+        self.assertNotEqual(hash_bytes_to_point(b'a',b'b'),hash_bytes_to_point(b'ab'))
+
+        # Test bad hash
+        with self.assertRaises(TypeError):
+            hash_bytes_to_point(0,None)
+
+    def test_hash_bytes_to_scalar(self):
+        self.assertEqual(hash_bytes_to_scalar('x',G),hash_bytes_to_scalar('x',G))
+        self.assertNotEqual(hash_bytes_to_scalar(Scalar(0)),hash_bytes_to_scalar(0))
+        self.assertNotEqual(hash_bytes_to_scalar(b'a',b'b'),hash_bytes_to_scalar(b'ab'))
+        self.assertTrue(0 <= hash_bytes_to_scalar(b'').x < l)
+
+        # Test bad hash
+        with self.assertRaises(TypeError):
+            hash_bytes_to_scalar(0,None)
+
+
+# Encoding
+class TestEncode(unittest.TestCase):
+    def test_encode(self):
+        # Test canonical encodings
+        self.assertEqual(encode(G),b'P' + G.to_bytes())
+        self.assertEqual(encode(Scalar(1)),b'S' + Scalar(1).to_bytes())
+        self.assertEqual(encode(PointVector([G + G,G])),b'V' + (2).to_bytes(8,'little') + (G + G).to_bytes() + G.to_bytes())
+        self.assertEqual(encode(ScalarVector([Scalar(1)])),b'W' + (1).to_bytes(8,'little') + Scalar(1).to_bytes())
+
+        # Test unambiguous encodings
+        self.assertNotEqual(encode(0),encode(Scalar(0)))
+        self.assertNotEqual(encode(-1),encode(255))
+        self.assertNotEqual(encode('a'),encode(b'a'))
+        self.assertNotEqual(encode(['ab']),encode(['a','b']))
+        self.assertNotEqual(encode(True),encode(1))
+
+        # Test bad encodings
+        with self.assertRaises(TypeError):
+            encode(None)
+        with self.assertRaises(TypeError):
+            encode([0,None])
+
 
 # Random functions
 class TestRandom(unittest.TestCase):
@@ -823,6 +997,105 @@ class TestRandom(unittest.TestCase):
         self.assertNotEqual(random_point(),random_point())
 
 
+# Fixed-base multiplication
+class TestFixedBase(unittest.TestCase):
+    def test_init(self):
+        # Test valid construction
+        P = random_point()
+        self.assertEqual(FixedBase(P),P)
+        self.assertIs(fixed_base(G),G)
+        self.assertIsInstance(fixed_base(P),FixedBase)
+
+        # Test invalid construction
+        with self.assertRaises(TypeError):
+            FixedBase(None)
+        with self.assertRaises(ValueError):
+            FixedBase(P,1)
+
+    def test_multiply(self):
+        P = random_point()
+        for w in range(2,7):
+            F = FixedBase(P,w)
+            for s in [Scalar(0),Scalar(1),Scalar(2),Scalar(-1),random_scalar()]:
+                self.assertEqual(F*s,P.multiply(s))
+                self.assertEqual(s*F,P.multiply(s))
+                self.assertEqual(F.multiply(s,vartime=True),P.multiply(s))
+                self.assertEqual(F.multiply(s,4),P.multiply(s))
+
+        # Test invalid multiplication
+        with self.assertRaises(TypeError):
+            FixedBase(P)*None
+
+# Field helpers
+class TestField(unittest.TestCase):
+    def test_batch_invert(self):
+        # Test valid inversion
+        values = [1,2,3,q-1,q+5]
+        self.assertEqual(batch_invert(values,q),[invert(value,q) for value in values])
+        self.assertEqual(batch_invert([],q),[])
+
+        # Test zero inversion
+        with self.assertRaises(ZeroDivisionError):
+            batch_invert([1,0,2],q)
+        with self.assertRaises(ZeroDivisionError):
+            batch_invert([q],q)
+
+
+# Scalar recoding
+class TestRecoding(unittest.TestCase):
+    def test_signed_digits(self):
+        for w in range(2,7):
+            for k in [0,1,2,7,255,l-1]:
+                digits = signed_digits(k,w)
+
+                # Digits are bounded and their number depends only on the width
+                for digit in digits:
+                    self.assertTrue(-2**(w-1) <= digit < 2**(w-1))
+                self.assertEqual(len(digits),len(signed_digits(0,w)))
+
+                # Digits reconstruct the value
+                self.assertEqual(sum(digits[i]*2**(w*i) for i in range(len(digits))),k)
+
+    def test_wnaf(self):
+        for w in range(2,7):
+            for k in [0,1,2,7,255,l-1]:
+                digits = wnaf(k,w)
+
+                # Digits are zero or odd and bounded
+                for digit in digits:
+                    self.assertTrue(digit == 0 or (digit & 1 and abs(digit) < 2**(w-1)))
+
+                # Nonzero digits are separated by at least w-1 zeros
+                nonzero = [i for i in range(len(digits)) if digits[i] != 0]
+                for i in range(1,len(nonzero)):
+                    self.assertGreaterEqual(nonzero[i] - nonzero[i-1],w)
+
+                # Digits reconstruct the value
+                self.assertEqual(sum(digits[i]*2**i for i in range(len(digits))),k)
+
+
+# Subset sums
+class TestSubsetSum(unittest.TestCase):
+    def test_subset_sum(self):
+        points = PointVector([random_point() for _ in range(6)])
+        bits = [1,0,0,1,1,0]
+
+        self.assertEqual(subset_sum(points,bits),points[0] + points[3] + points[4])
+        self.assertEqual(subset_sum(points,bits,complement=True),points[1] + points[2] + points[5])
+        self.assertEqual(subset_sum(points,[0]*6),Z)
+        self.assertEqual(subset_sum(PointVector(),[]),Z)
+
+        # Matches a multiexp with bit scalars
+        self.assertEqual(subset_sum(points,bits),points**ScalarVector([Scalar(bit) for bit in bits]))
+
+        with self.assertRaises(IndexError):
+            subset_sum(points,bits[1:])
+        with self.assertRaises(ValueError):
+            subset_sum(points,[2] + bits[1:])
+        with self.assertRaises(TypeError):
+            subset_sum(points.points,bits)
+
+
 # Multiscalar multiplication
 class TestMultiexp(unittest.TestCase):
     def test_multiexp(self):
@@ -841,11 +1114,70 @@ class TestMultiexp(unittest.TestCase):
         self.assertEqual(multiexp(s1,P1),Z)
         self.assertEqual(multiexp(s0,P0),Z)
 
+        # Test both algorithms and several window widths against naive multiplication
+        for n in [1,2,7,33]:
+            scalars = ScalarVector([random_scalar() for _ in range(n-1)] + [Scalar(-1)])
+            points = PointVector([random_point() for _ in range(n)])
+            expected = Z
+            for i in range(n):
+                expected += scalars[i]*points[i]
+            ints = [int(scalar) for scalar in scalars]
+            self.assertEqual(multiexp(scalars,points),expected)
+            self.assertEqual(multiexp_straus(ints,points),expected)
+            self.assertEqual(multiexp(scalars,points,batch_affine=True),expected)
+            for c in range(2,9):
+                self.assertEqual(multiexp_pippenger(ints,points,c),expected)
+                self.assertEqual(multiexp_pippenger(ints,points,c,batch_affine=True),expected)
+
+        # Test window selection
+        self.assertGreater(pippenger_window(2**16),pippenger_window(2**4))
+
         # Test invalid operations
         with self.assertRaises(TypeError):
             multiexp(P3,s3)
         with self.assertRaises(TypeError):
             multiexp(P3,s2)
 
+# Profiling
+class TestProfiling(unittest.TestCase):
+    def test_profiling(self):
+        P = random_point()
+
+        # Test that nothing is recorded without an active profile
+        with phase('ignored'):
+            P*Scalar(2)
+
+        with profiling() as profile:
+            # Test unattributed operations
+            P + P
+            invert(2,q)
+
+            # Test attributed operations
+            with phase('test'):
+                P*Scalar(2)
+                hash_to_scalar('test')
+                multiexp(ScalarVector([Scalar(1),Scalar(2)]),PointVector([P,P]))
+
+        self.assertEqual(profile.counts[None]['point addition'],1)
+        self.assertEqual(profile.counts[None]['inversion'],1)
+        self.assertEqual(profile.counts['test']['scalar multiplication'],1)
+        self.assertEqual(profile.counts['test']['hash to scalar'],1)
+        self.assertEqual(profile.counts['test']['multiexp'],1)
+        self.assertGreater(profile.counts['test']['point doubling'],0)
+        self.assertEqual(profile.sizes['test'],[2])
+        self.assertGreater(profile.times['test']['phase'],0)
+        self.assertNotIn('ignored',profile.counts)
+        self.assertEqual(profile.totals()['inversion'],profile.counts[None]['inversion'] + profile.counts['test'].get('inversion',0))
+
+        # Test that a fixed-base multiplication with a forced window is only recorded once
+        F = FixedBase(P)
+        with profiling() as profile:
+            F.multiply(Scalar(5),4)
+        self.assertEqual(profile.counts[None]['fixed-base scalar multiplication'],1)
+        self.assertNotIn('scalar multiplication',profile.counts[None])
+
+        # Test that the profile is no longer active
+        self.assertIsNone(dumb25519.active_profile)
+
 if __name__ == '__main__':
 	unittest.main()
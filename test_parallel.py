@@ -1,6 +1,6 @@
 import parallel
-from dumb25519 import random_point, random_scalar, PointVector
-from random import randrange
+from dumb25519 import random_point, random_scalar, PointVector, Scalar
+from random import randrange, sample
 import unittest
 
 class TestParallel(unittest.TestCase):
@@ -23,6 +23,82 @@ class TestParallel(unittest.TestCase):
 
 		proof = parallel.prove(statement,witness)
 		parallel.verify(statement,proof)
+		parallel.verify(statement,proof,combined=False)
+
+		# A modified proof fails
+		for attribute in ['zA','zC','zS']:
+			setattr(proof,attribute,getattr(proof,attribute) + Scalar(1))
+			with self.assertRaises(ArithmeticError):
+				parallel.verify(statement,proof)
+			setattr(proof,attribute,getattr(proof,attribute) - Scalar(1))
+
+	def test_batch(self):
+		params = parallel.ParallelParameters(random_point(),2,3)
+		N = params.n**params.m
+		S = PointVector([random_point() for _ in range(N)])
+		V = PointVector([random_point() for _ in range(N)])
+
+		# Proofs for different indexes and offsets over the same sets
+		statements = []
+		proofs = []
+		for l in sample(range(N),3):
+			s = random_scalar()
+			v = random_scalar()
+			S1 = S[l] - s*params.F
+			V1 = V[l] - v*params.F
+			statement = parallel.ParallelStatement(params,S,V,S1,V1)
+			statements.append(statement)
+			proofs.append(parallel.prove(statement,parallel.ParallelWitness(l,s,v)))
+
+		parallel.verify_batch(statements,proofs)
+
+		# A modified proof fails
+		proofs[1].zV += Scalar(1)
+		with self.assertRaises(ArithmeticError):
+			parallel.verify_batch(statements,proofs)
+
+		# Sets must be shared
+		other = parallel.ParallelStatement(params,PointVector([random_point() for _ in range(N)]),V,statements[0].S1,statements[0].V1)
+		with self.assertRaises(ValueError):
+			parallel.verify_batch([other] + statements[1:],proofs)
+
+	def test_tensor_products(self):
+		n = 3
+		m = 3
+		f = [[random_scalar() for _ in range(n)] for _ in range(m)]
+		products = parallel.tensor_products([[f_.x for f_ in row] for row in f])
+		self.assertEqual(len(products),n**m)
+		for i in range(n**m):
+			digits = parallel.decompose(i,n,m)
+			expected = f[0][digits[0]]*f[1][digits[1]]*f[2][digits[2]]
+			self.assertEqual(Scalar(products[i]),expected)
+
+	def test_polynomial_columns(self):
+		n = 3
+		m = 3
+		a = [[random_scalar() for _ in range(n)] for _ in range(m)]
+		decomp_l = [2,0,1]
+		subtrees = list(parallel.polynomial_columns(a,decomp_l))
+		self.assertEqual([i for i,_ in subtrees],list(range(n)))
+		for k in range(n**m):
+			columns = subtrees[k % n][1]
+			self.assertEqual(len(columns),m)
+			digits = parallel.decompose(k,n,m)
+
+			# Expand the product of linear factors directly
+			poly = [Scalar(1)]
+			for j in range(m):
+				factor = [a[j][digits[j]],Scalar(1) if digits[j] == decomp_l[j] else Scalar(0)]
+				poly = [sum([poly[i]*factor[d-i] for i in range(len(poly)) if 0 <= d-i <= 1],Scalar(0)) for d in range(len(poly)+1)]
+			for j in range(m):
+				self.assertEqual(Scalar(columns[j][k // n]),poly[j])
+
+	def test_decompose(self):
+		self.assertEqual(parallel.decompose(11,3,3),[2,0,1])
+
+		# Exact for indexes beyond float precision
+		self.assertEqual(parallel.decompose(2**60 - 1,2,60),[1]*60)
+		self.assertEqual(parallel.decompose(2**60,2,61),[0]*60 + [1])
 
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
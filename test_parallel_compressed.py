@@ -1,5 +1,5 @@
 import parallel_compressed
-from dumb25519 import random_point, random_scalar, PointVector
+from dumb25519 import random_point, random_scalar, PointVector, Scalar
 from random import randrange
 import unittest
 
@@ -23,6 +23,57 @@ class TestParallelCompressed(unittest.TestCase):
 
 		proof = parallel_compressed.prove(statement,witness)
 		parallel_compressed.verify(statement,proof)
+		parallel_compressed.verify(statement,proof,combined=False)
+
+		# A modified proof fails
+		for attribute in ['zA','zC','z']:
+			setattr(proof,attribute,getattr(proof,attribute) + Scalar(1))
+			with self.assertRaises(ArithmeticError):
+				parallel_compressed.verify(statement,proof)
+			setattr(proof,attribute,getattr(proof,attribute) - Scalar(1))
+
+		# A malformed proof fails
+		proof.f = proof.f[1:]
+		with self.assertRaises(IndexError):
+			parallel_compressed.verify(statement,proof)
+
+	def test_tensor_products(self):
+		n = 3
+		m = 3
+		f = [[random_scalar() for _ in range(n)] for _ in range(m)]
+		products = parallel_compressed.tensor_products([[f_.x for f_ in row] for row in f])
+		self.assertEqual(len(products),n**m)
+		for i in range(n**m):
+			digits = parallel_compressed.decompose(i,n,m)
+			expected = f[0][digits[0]]*f[1][digits[1]]*f[2][digits[2]]
+			self.assertEqual(Scalar(products[i]),expected)
+
+	def test_polynomial_columns(self):
+		n = 3
+		m = 3
+		a = [[random_scalar() for _ in range(n)] for _ in range(m)]
+		decomp_l = [2,0,1]
+		subtrees = list(parallel_compressed.polynomial_columns(a,decomp_l))
+		self.assertEqual([i for i,_ in subtrees],list(range(n)))
+		for k in range(n**m):
+			columns = subtrees[k % n][1]
+			self.assertEqual(len(columns),m)
+			digits = parallel_compressed.decompose(k,n,m)
+
+			# Expand the product of linear factors directly
+			poly = [Scalar(1)]
+			for j in range(m):
+				factor = [a[j][digits[j]],Scalar(1) if digits[j] == decomp_l[j] else Scalar(0)]
+				poly = [sum([poly[i]*factor[d-i] for i in range(len(poly)) if 0 <= d-i <= 1],Scalar(0)) for d in range(len(poly)+1)]
+			for j in range(m):
+				self.assertEqual(Scalar(columns[j][k // n]),poly[j])
+
+	def test_decompose(self):
+		self.assertEqual(parallel_compressed.decompose(11,3,3),[2,0,1])
+
+		# Exact for indexes beyond float precision
+		self.assertEqual(parallel_compressed.decompose(2**60 - 1,2,60),[1]*60)
+		self.assertEqual(parallel_compressed.decompose(2**60,2,61),[0]*60 + [1])
 
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
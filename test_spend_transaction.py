@@ -1,6 +1,6 @@
 import address
 import coin
-from dumb25519 import random_point
+from dumb25519 import random_point, Scalar
 from random import randrange, sample
 import spend_transaction
 import unittest
@@ -10,12 +10,54 @@ def random_public_address():
 
 class TestSpend(unittest.TestCase):
 	def test_spend(self):
-		n = 2
-		m = 2
-		value_bytes = 4
-		memo_bytes = 16
+		self.spend([2,3],False)
+
+	def test_spend_aggregate(self):
+		transaction,outputs,coin_params,incoming = self.spend([1,2,2],True)
+
+		# All outputs share a padded proof
+		for output in outputs:
+			self.assertIs(output.range,transaction.range)
+			self.assertEqual(len(output.range_C),4)
+
+		# The recipient verifies the shared proof
+		outputs[0].identify(coin_params,incoming)
+		self.assertEqual(outputs[0].value,1)
+
+	def test_range_batch(self):
+		protocol_params = self.protocol_params()
+		transaction,_,coin_params,_ = self.spend([2,3],False,protocol_params)
+		transaction_aggregate,outputs_aggregate,_,_ = self.spend([1,2,2],True,protocol_params)
+
+		# Several transactions, mixing aggregated and separate proofs, verify in one batch
+		spend_transaction.verify_range_batch(protocol_params,[transaction,transaction_aggregate])
+		spend_transaction.verify_range_batch(protocol_params,[transaction],outputs_aggregate)
+
+		# A coin must be in the aggregated proof it refers to
+		outputs_aggregate[0].range_index = 1
+		with self.assertRaises(ValueError):
+			spend_transaction.verify_range_batch(protocol_params,[transaction],outputs_aggregate)
+		outputs_aggregate[0].range_index = 0
+
+		# Mint coins have no range proofs
+		mint = coin.Coin(coin_params,random_public_address(),1,'Mint memo',True,False)
+		with self.assertRaises(ValueError):
+			spend_transaction.verify_range_batch(protocol_params,[transaction],[mint])
+
+		# A modified proof fails the batch
+		transaction_aggregate.range.r1 += Scalar(1)
+		with self.assertRaises(ArithmeticError):
+			spend_transaction.verify_range_batch(protocol_params,[transaction,transaction_aggregate])
+
+	def protocol_params(self):
+		return spend_transaction.ProtocolParameters(random_point(),random_point(),random_point(),random_point(),4,16,2,2)
+
+	def spend(self,output_values,aggregate,protocol_params=None):
+		if protocol_params is None:
+			protocol_params = self.protocol_params()
+		n = protocol_params.n
+		m = protocol_params.m
 		input_values = [1,2,3]
-		output_values = [2,3]
 		fee = sum(input_values) - sum(output_values)
 		w = len(input_values)
 		t = len(output_values)
@@ -26,7 +68,6 @@ class TestSpend(unittest.TestCase):
 		self.assertGreaterEqual(n**m,w)
 		self.assertGreaterEqual(t,1)
 
-		protocol_params = spend_transaction.ProtocolParameters(random_point(),random_point(),random_point(),random_point(),value_bytes,memo_bytes,n,m)
 		address_params = address.AddressParameters(protocol_params.F,protocol_params.G,len(input_values))
 		coin_params = coin.CoinParameters(protocol_params.F,protocol_params.G,protocol_params.H,protocol_params.U,protocol_params.value_bytes,protocol_params.memo_bytes)
 
@@ -61,13 +102,17 @@ class TestSpend(unittest.TestCase):
 		for j in range(t):
 			outputs.append(coin.Coin(
 				coin_params,
-				random_public_address(),
+				public[0] if j == 0 else random_public_address(),
 				output_values[j],
 				'Output memo',
 				False,
-				True
+				True,
+				aggregate
 			))
 
+		# Output coin hashes do not depend on the range proof being attached yet
+		hashes = [repr(output) for output in outputs]
+
 		# Generate the spend transaction
 		transaction = spend_transaction.SpendTransaction(
 			protocol_params,
@@ -78,11 +123,19 @@ class TestSpend(unittest.TestCase):
 			fee,
 			outputs
 		)
+		if aggregate:
+			self.assertEqual([repr(output) for output in outputs],hashes)
 
 		# Verify it
 		transaction.verify(
 			protocol_params
 		)
 
+		# Verify range proofs separately in a batch with the identified input coins
+		transaction.verify(protocol_params,verify_range=False)
+		spend_transaction.verify_range_batch(protocol_params,[transaction],[inputs[l[u]] for u in range(w)] + outputs)
+
+		return transaction,outputs,coin_params,incoming
+
 if __name__ == '__main__':
 	unittest.main()
\ No newline at end of file
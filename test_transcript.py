@@ -0,0 +1,35 @@
+from dumb25519 import G, Scalar, PointVector, random_point
+import transcript
+import unittest
+
+class TestTranscript(unittest.TestCase):
+	def test_challenge(self):
+		# Identical transcripts yield identical challenges
+		P = PointVector([random_point() for _ in range(4)])
+		challenges = []
+		for _ in range(2):
+			tr = transcript.Transcript('Test')
+			tr.update(G)
+			tr.update(P)
+			tr.update(4)
+			challenges.append([tr.challenge(),tr.challenge()])
+		self.assertEqual(challenges[0],challenges[1])
+
+		# Successive challenges are fresh
+		self.assertNotEqual(challenges[0][0],challenges[0][1])
+
+	def test_separation(self):
+		def challenge(prefix,*data):
+			tr = transcript.Transcript(prefix)
+			for datum in data:
+				tr.update(datum)
+			return tr.challenge()
+
+		# Prefixes, data, and data boundaries are all bound
+		self.assertNotEqual(challenge('A'),challenge('B'))
+		self.assertNotEqual(challenge('A','bc'),challenge('A','b','c'))
+		self.assertNotEqual(challenge('A',Scalar(1)),challenge('A',1))
+		self.assertNotEqual(challenge('A'),challenge('A',None))
+
+if __name__ == '__main__':
+	unittest.main()
@@ -1,21 +1,26 @@
 # Transcript challenge handling
+#
+# Public data is absorbed into a running BLAKE2b state as canonical byte encodings
+# Challenges are derived from a copy of the state by wide reduction of a 64-byte digest
 
 from dumb25519 import *
+from hashlib import blake2b
 
 class Transcript:
     # Initialize the transcript
     def __init__(self,prefix):
-        self.state = hash_to_scalar(prefix)
+        self.state = blake2b(b'Spark transcript')
+        self.state.update(encode(prefix))
 
     # Update the transcript with public data
     def update(self,data=None):
         if data is None:
-            self.state = hash_to_scalar(self.state)
+            self.state.update(b'N')
         else:
-            self.state = hash_to_scalar(self.state,data)
+            self.state.update(encode(data))
 
     # Retrieve a challenge scalar and update the state
     def challenge(self):
-        x = self.state
-        self.update() # ensures fresh challenges
-        return x
+        digest = self.state.copy().digest()
+        self.state.update(b'C' + digest) # ensures fresh challenges
+        return Scalar(int.from_bytes(digest,'little'))